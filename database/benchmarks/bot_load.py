@@ -0,0 +1,163 @@
+"""
+Load test of FilmBot update handling against a local stub of the Telegram Bot API.
+
+The stub serves ``--updates`` fake "/load" commands through getUpdates. The handler
+picks a random film from the database (plus ``--delay`` seconds of simulated slow
+query) and answers with sendMessage. Handler latency is the time from serving an
+update to receiving its answer, reported for every number of workers:
+    python -m benchmarks.bot_load --workers 1 8 --updates 200 --delay 0.05
+
+Run from the ``database`` directory, the database is taken from DATABASE_URL.
+"""
+
+import argparse
+import json
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter, sleep
+from urllib.parse import parse_qs, urlparse
+
+import telebot
+
+import init_django_orm  # noqa: F401
+from bot.bot import FilmBot
+from db.models import Film
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "FilmBot", "username": "film_bot"}
+
+
+class StubTelegram(ThreadingHTTPServer):
+    def __init__(self, updates: int):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.updates = [
+            {
+                "update_id": i,
+                "message": {
+                    "message_id": i,
+                    "date": 0,
+                    "chat": {"id": i, "type": "private"},
+                    "from": {"id": i, "is_bot": False, "first_name": "User"},
+                    "text": "/load",
+                },
+            }
+            for i in range(1, updates + 1)
+        ]
+        self.served = {}
+        self.answered = {}
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/bot{{0}}/{{1}}"
+
+    def get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        updates = [u for u in self.updates if u["update_id"] >= offset][:limit]
+        if not updates:
+            # Nothing new, like an empty long poll
+            sleep(0.05)
+        now = perf_counter()
+        with self.lock:
+            for update in updates:
+                self.served.setdefault(update["update_id"], now)
+        return updates
+
+    def send_message(self, params: dict) -> dict:
+        chat_id = int(params["chat_id"])
+        with self.lock:
+            self.answered[chat_id] = perf_counter()
+            if len(self.answered) == len(self.updates):
+                self.done.set()
+        return {
+            "message_id": chat_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+    def latencies(self) -> list[float]:
+        return [self.answered[i] - self.served[i] for i in self.answered]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubTelegram
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = parse_qs(self.rfile.read(length).decode())
+            params.update({key: values[0] for key, values in body.items()})
+
+        method = url.path.rsplit("/", 1)[-1]
+        if method == "getUpdates":
+            result = self.server.get_updates(params)
+        elif method == "sendMessage":
+            result = self.server.send_message(params)
+        else:
+            result = BOT_USER if method == "getMe" else True
+
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+def run(workers: int, updates: int, delay: float):
+    stub = StubTelegram(updates)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    telebot.apihelper.API_URL = stub.api_url
+
+    film_bot = FilmBot("0:stub", workers=workers)
+
+    @film_bot.command("load")
+    def load(message):
+        film = Film.objects.filter(rating__gte=7).random()
+        sleep(delay)
+        film_bot.bot.send_message(message.chat.id, film.name if film else "no film")
+
+    thread = threading.Thread(target=film_bot.start)
+    started = perf_counter()
+    thread.start()
+    finished = stub.done.wait(60)
+    elapsed = perf_counter() - started
+    film_bot.stop()
+    thread.join()
+    stub.shutdown()
+
+    latencies = sorted(stub.latencies())
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    print(
+        f"workers: {workers:3}  answered: {len(latencies)}/{updates}"
+        f"{'' if finished else ' (timed out)'}  "
+        f"p50: {percentiles[49] * 1000:8.1f} ms  "
+        f"p95: {percentiles[94] * 1000:8.1f} ms  "
+        f"p99: {percentiles[98] * 1000:8.1f} ms  "
+        f"{len(latencies) / elapsed:7.1f} updates/sec"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    arg_parser.add_argument("--updates", type=int, default=200)
+    arg_parser.add_argument("--delay", type=float, default=0.05)
+    args = arg_parser.parse_args()
+
+    for workers in args.workers:
+        run(workers, args.updates, args.delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Compare parse time per page of the previous Movie.parse_page implementation
+(html.parser, repeated table searches) with the current one (lxml, InfoTable).
+Both must give the same output for every page, the benchmark fails otherwise.
+
+Pages are taken from a corpus recorded with ``python -m benchmarks.parser record``,
+benchmarks/corpus by default. Run from the ``database`` directory:
+    python -m benchmarks.movie_parser [path/to/corpus]
+"""
+
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from bs4 import BeautifulSoup
+
+from benchmarks.parser import CORPUS
+from hdrezka_parser.parser import Movie
+from hdrezka_parser.replay import ResponseReplay
+
+
+def legacy_parse_page(page: BeautifulSoup, external_id: int) -> dict:
+    """
+    Movie.parse_page as it was before InfoTable, without the trailer request.
+    """
+    table = page.select_one("table")
+    str_time = (
+        table.find(itemprop="duration")
+        and table.find(itemprop="duration").text.split()[0]
+    )
+    try:
+        duration = int(str_time)
+    except ValueError:
+        if ":" in str_time:
+            hours, minutes = str_time.split(":")
+            duration = int(hours) * 60 + int(minutes)
+        elif "-" in str_time:
+            duration = int(str_time.split("-")[-1])
+        else:
+            duration = "".join([w for w in str_time if w.isdigit()])
+    except TypeError:
+        duration = None
+
+    original_name = (
+        page.select_one(".b-post__origtitle")
+        and page.select_one(".b-post__origtitle").text
+    )
+    dubbing = table.find(string="В переводе") and table.find(
+        string="В переводе"
+    ).parent.parent.parent.td.find_next_sibling("td").text.replace(" и ", ", ").split(
+        ", "
+    )
+    age = table.find(string="Возраст") and int(
+        table.find(string="Возраст")
+        .parent.parent.parent.td.find_next_sibling("td")
+        .span.text[:-1]
+    )
+    description = (
+        page.select_one(".b-post__description_text")
+        and page.select_one(".b-post__description_text").text
+        or table.find(string="Слоган")
+        .parent.parent.parent.select_one("td:last-child")
+        .text
+    )
+    return {
+        "name": page.select_one(".b-post__title > h1").text,
+        "original_name": original_name,
+        "description": description,
+        "country": table.find(string="Страна")
+        and table.find(string="Страна").parent.parent.parent.select_one("td > a").text,
+        "trailer": None,
+        "release": table.find(string="Дата выхода")
+        and Movie.get_date_from_site(
+            table.find(string="Дата выхода")
+            .parent.parent.parent.select_one("td:last-child")
+            .text.replace("года", "")
+        ),
+        "rating": table.select_one(".imdb .bold")
+        and float(table.select_one(".imdb .bold").text),
+        "genres": [genre.text for genre in table.find_all(itemprop="genre")],
+        "actors": [
+            {
+                "external_id": actor["data-id"],
+                "name": actor.find(itemprop="name").text,
+                "profession": actor["data-job"].lower(),
+            }
+            for actor in table.find_all(itemprop="actor")
+        ],
+        "directors": [
+            {
+                "external_id": director["data-id"],
+                "name": director.find(itemprop="name").text,
+                "profession": director["data-job"].lower(),
+            }
+            for director in table.find_all(itemprop="director")
+        ],
+        "external_id": external_id,
+        "dubbing": dubbing,
+        "duration": duration,
+        "age_limit": age,
+        "poster": page.select_one(".b-sidecover img")["src"],
+    }
+
+
+def legacy(external_id: int, html: bytes) -> dict:
+    return legacy_parse_page(BeautifulSoup(html, "html.parser"), external_id)
+
+
+def current(external_id: int, html: bytes) -> dict:
+    return Movie.from_html(external_id, html).parse_page()
+
+
+def outcome(parse: callable, external_id: int, html: bytes) -> dict | str:
+    try:
+        return parse(external_id, html)
+    except AttributeError as e:
+        return f"AttributeError: {e}"
+
+
+def check_same_output(pages: list[tuple[int, bytes]]):
+    """
+    Both implementations must give the same films, or fail on the same pages.
+    """
+    for external_id, html in pages:
+        before = outcome(legacy, external_id, html)
+        after = outcome(current, external_id, html)
+        if before == after:
+            continue
+        if isinstance(before, dict) and isinstance(after, dict):
+            fields = [field for field in before if before[field] != after.get(field)]
+            fields += [field for field in after if field not in before]
+            raise AssertionError(f"Page #{external_id} differs in {fields}")
+        raise AssertionError(f"Page #{external_id}: {before!r} != {after!r}")
+
+
+def measure(parse: callable, pages: list[tuple[int, bytes]], rounds: int) -> float:
+    started = perf_counter()
+    for _ in range(rounds):
+        for external_id, html in pages:
+            try:
+                parse(external_id, html)
+            except AttributeError:
+                pass
+    return (perf_counter() - started) / (rounds * len(pages))
+
+
+def load_pages(corpus: str | Path) -> list[tuple[int, bytes]]:
+    pages = []
+    for entry in ResponseReplay(corpus, mode="replay").entries():
+        external_id = Movie.id_from_url(entry["url"])
+        if external_id is not None and entry["status_code"] == 200:
+            pages.append((external_id, entry["body_path"].read_bytes()))
+    return pages
+
+
+def main(corpus: str | Path = CORPUS, rounds: int = 3):
+    pages = load_pages(corpus)
+    if not pages:
+        raise ValueError(f"No movie pages found in {corpus}")
+    check_same_output(pages)
+
+    old_time = measure(legacy, pages, rounds)
+    new_time = measure(current, pages, rounds)
+
+    print(f"{len(pages)} pages, same output, {rounds} rounds")
+    print(f"before: {old_time * 1000:8.2f} ms/page")
+    print(f"after:  {new_time * 1000:8.2f} ms/page ({old_time / new_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,152 @@
+"""
+Reproducible parser benchmark over a corpus of recorded responses.
+
+Record a corpus from the live site (movie pages and the pages
+of every maker found in them):
+    python -m benchmarks.parser record path/to/corpus --start 1 --count 200
+
+Run Movie.parse_page and Maker.parse_page over it without network access:
+    python -m benchmarks.parser run path/to/corpus
+
+Both commands are run from the ``database`` directory. Without a path ``run`` uses
+the small corpus kept in benchmarks/corpus: ten movie pages covering the layouts
+the parser handles (series, missing original title, rating or duration, a slogan
+instead of a description), two missing pages and six person pages.
+"""
+
+import argparse
+import statistics
+import tracemalloc
+from functools import partial
+from pathlib import Path
+from time import perf_counter
+
+import requests
+
+import init_django_orm  # noqa: F401
+
+from hdrezka_parser.parser import Maker, Movie, Page
+from hdrezka_parser.replay import response_replay
+from pipeline import Pipeline, Stage
+
+CORPUS = Path(__file__).resolve().parent / "corpus"
+
+
+def fetch(page_class: type[Page], page_id: int) -> dict | None:
+    try:
+        return page_class(page_id).parse_page()
+    except (requests.exceptions.HTTPError, AttributeError):
+        return None
+
+
+def record(corpus: str, start: int, count: int, workers: int):
+    response_replay.configure(corpus, mode="record")
+
+    maker_ids = set()
+
+    def collect_makers(movie: dict):
+        maker_ids.update(
+            int(maker["external_id"]) for maker in movie["actors"] + movie["directors"]
+        )
+
+    Pipeline(
+        [
+            Stage("movie", partial(fetch, Movie), workers),
+            Stage("makers", collect_makers),
+        ]
+    ).run(range(start, start + count))
+    Pipeline([Stage("maker", partial(fetch, Maker), workers)]).run(sorted(maker_ids))
+
+
+def corpus_ids(page_class: type[Page]) -> list[int]:
+    return sorted(
+        page_id
+        for page_id in (
+            page_class.id_from_url(entry["url"])
+            for entry in response_replay.entries()
+            if entry["status_code"] == 200
+        )
+        if page_id is not None
+    )
+
+
+def parse_all(page_class: type[Page], ids: list[int]) -> tuple:
+    latencies = []
+    failed = 0
+    for page_id in ids:
+        page_started = perf_counter()
+        try:
+            page_class(page_id).parse_page()
+        except AttributeError:
+            failed += 1
+        latencies.append(perf_counter() - page_started)
+    return latencies, failed
+
+
+def measure(page_class: type[Page], ids: list[int]) -> dict:
+    started = perf_counter()
+    latencies, failed = parse_all(page_class, ids)
+    elapsed = perf_counter() - started
+
+    # tracemalloc slows everything down, so memory is measured in a separate pass
+    tracemalloc.start()
+    parse_all(page_class, ids)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if len(latencies) > 1:
+        percentiles = statistics.quantiles(latencies, n=100)
+    else:
+        percentiles = latencies * 99
+
+    return {
+        "pages": len(ids),
+        "failed": failed,
+        "pages_per_second": len(ids) / elapsed if elapsed else 0.0,
+        "p50_ms": percentiles[49] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+def run(corpus: str | Path = CORPUS):
+    response_replay.configure(corpus, mode="replay")
+
+    for page_class in (Movie, Maker):
+        ids = corpus_ids(page_class)
+        if not ids:
+            print(f"{page_class.__name__}: no pages in the corpus")
+            continue
+
+        result = measure(page_class, ids)
+        print(
+            f"{page_class.__name__:<6} {result['pages']} pages "
+            f"({result['failed']} failed), "
+            f"{result['pages_per_second']:.1f} pages/sec, "
+            f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, "
+            f"peak memory {result['peak_memory_mb']:.1f} MB"
+        )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record")
+    record_parser.add_argument("corpus")
+    record_parser.add_argument("--start", type=int, default=1)
+    record_parser.add_argument("--count", type=int, default=100)
+    record_parser.add_argument("--workers", type=int, default=1)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("corpus", nargs="?", default=CORPUS)
+
+    args = arg_parser.parse_args()
+    if args.command == "record":
+        record(args.corpus, args.start, args.count, args.workers)
+    else:
+        run(args.corpus)
+
+
+if __name__ == "__main__":
+    main()
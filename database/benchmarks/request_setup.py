@@ -0,0 +1,52 @@
+"""
+Micro-benchmark of the per-request setup done before every page fetch:
+picking a User-Agent and reading the request config.
+
+Run from the ``database`` directory:
+    python -m benchmarks.request_setup
+"""
+
+import json
+from timeit import timeit
+
+from fake_useragent import UserAgent
+
+from hdrezka_parser.config import request_config, user_agents
+
+
+def rebuild_user_agent():
+    return UserAgent().random
+
+
+def cached_user_agent():
+    return user_agents.random
+
+
+def reload_config():
+    with open("requests_data.json", "rb") as file:
+        return json.load(fp=file)["base"]
+
+
+def cached_config():
+    return request_config["base"]
+
+
+def compare(name: str, old: callable, new: callable, number: int):
+    old()
+    new()
+    old_time = timeit(old, number=number) / number
+    new_time = timeit(new, number=number) / number
+    print(
+        f"{name:<12} before: {old_time * 1e6:10.1f} µs  "
+        f"after: {new_time * 1e6:8.1f} µs  "
+        f"saved per request: {(old_time - new_time) * 1e6:10.1f} µs"
+    )
+
+
+def main(number: int = 200):
+    compare("user agent", rebuild_user_agent, cached_user_agent, number)
+    compare("config", reload_config, cached_config, number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+CPU used by the bot scheduler while it waits for the next post: the old
+``while True: run_pending()`` loop against bot.scheduler.Scheduler.
+
+Run from the ``database`` directory:
+    python -m benchmarks.scheduler_idle [seconds]
+"""
+
+import sys
+import threading
+from datetime import datetime, timedelta
+from time import perf_counter, process_time
+
+import schedule
+
+from bot.scheduler import Scheduler
+
+
+def next_hour() -> str:
+    # Far enough for the job not to run while measuring
+    return (datetime.now() + timedelta(hours=1)).strftime("%H:%M")
+
+
+def busy_loop(seconds: float):
+    jobs = schedule.Scheduler()
+    jobs.every().day.at(next_hour()).do(print)
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            jobs.run_pending()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    stop.wait(seconds)
+    stop.set()
+    thread.join()
+
+
+def sleeping_scheduler(seconds: float):
+    scheduler = Scheduler()
+    scheduler.every_day(next_hour(), print)
+    scheduler.start()
+    threading.Event().wait(seconds)
+    scheduler.stop()
+
+
+def measure(name: str, wait: callable, seconds: float):
+    cpu, wall = process_time(), perf_counter()
+    wait(seconds)
+    cpu, wall = process_time() - cpu, perf_counter() - wall
+    print(f"{name:<10} CPU: {cpu:6.3f}s over {wall:.1f}s ({cpu / wall:6.1%} of a core)")
+    return cpu / wall
+
+
+def main(seconds: float = 5):
+    seconds = float(seconds)
+    measure("busy loop", busy_loop, seconds)
+    share = measure("scheduler", sleeping_scheduler, seconds)
+    assert share < 0.01, "the scheduler should be asleep while idle"
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
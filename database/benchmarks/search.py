@@ -0,0 +1,140 @@
+"""
+Compare searching films with icontains scans over Film and MovieMaker names
+against search.search_films backed by the full-text index.
+
+The database is taken from DATABASE_URL like everywhere else, e.g.
+    DATABASE_URL=sqlite:///bench.sqlite3 python -m benchmarks.search --films 200000
+Point it at a scratch database migrated to the latest state: synthetic films and
+makers are written with external ids starting at FIRST_ID. Pass --keep to leave
+them for the next run instead of removing them afterwards.
+"""
+
+import argparse
+import random
+import statistics
+from time import perf_counter
+
+from django.db import connection
+from django.db.models import Q
+
+import init_django_orm  # noqa: F401
+from db.models import Film, MovieMaker
+from search import rebuild_index, search_films
+
+FIRST_ID = 10_000_000
+SYLLABLES = "ка ло ми ра то ну се ва де ри по жи бо ла ге ту не мо ски да".split()
+FIRST_NAMES = ["Том", "Анна", "Иван", "Мария", "Джон", "Эмма", "Пётр", "Ольга"]
+LAST_NAMES = [f"Фамилия{i}" for i in range(5000)]
+
+
+def word() -> str:
+    return "".join(random.choices(SYLLABLES, k=random.randint(2, 4)))
+
+
+def title() -> str:
+    return " ".join(word() for _ in range(random.randint(1, 4))).capitalize()
+
+
+def populate(count: int, chunk_size: int = 10_000) -> int:
+    existing = Film.objects.filter(external_id__gte=FIRST_ID).count()
+    if existing >= count:
+        return existing
+
+    MovieMaker.objects.bulk_create(
+        [
+            MovieMaker(
+                external_id=FIRST_ID + i,
+                name=f"{random.choice(FIRST_NAMES)} {last_name}",
+            )
+            for i, last_name in enumerate(LAST_NAMES)
+        ],
+        ignore_conflicts=True,
+    )
+    maker_ids = list(
+        MovieMaker.objects.filter(external_id__gte=FIRST_ID).values_list(
+            "pk", flat=True
+        )
+    )
+
+    for first in range(existing, count, chunk_size):
+        ids = range(first, min(first + chunk_size, count))
+        Film.objects.bulk_create(
+            [
+                Film(external_id=FIRST_ID + i, name=title(), original_name=title())
+                for i in ids
+            ]
+        )
+        film_ids = Film.objects.filter(
+            external_id__gte=FIRST_ID + ids.start, external_id__lt=FIRST_ID + ids.stop
+        ).values_list("pk", flat=True)
+        Film.actors.through.objects.bulk_create(
+            [
+                Film.actors.through(film_id=film_id, moviemaker_id=maker_id)
+                for film_id in film_ids
+                for maker_id in random.sample(maker_ids, 3)
+            ]
+        )
+    return Film.objects.filter(external_id__gte=FIRST_ID).count()
+
+
+def scan(query: str, limit: int = 10) -> list[Film]:
+    films = Film.objects.all()
+    for word in query.split():
+        films = films.filter(
+            Q(name__icontains=word)
+            | Q(original_name__icontains=word)
+            | Q(actors__name__icontains=word)
+        )
+    return list(films.distinct()[:limit])
+
+
+def measure(name: str, search: callable, queries: list[str]):
+    timings = []
+    for query in queries:
+        started = perf_counter()
+        search(query)
+        timings.append(perf_counter() - started)
+    print(
+        f"{name:<14} median: {statistics.median(timings) * 1000:9.2f} ms  "
+        f"max: {max(timings) * 1000:9.2f} ms"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--films", type=int, default=200_000)
+    arg_parser.add_argument("--queries", type=int, default=20)
+    arg_parser.add_argument("--keep", action="store_true")
+    args = arg_parser.parse_args()
+
+    started = perf_counter()
+    total = populate(args.films)
+    rebuild_index()
+    print(f"{total} films indexed in {perf_counter() - started:.1f}s")
+
+    # A known title, an actor's surname, or a word of a title with a surname
+    films = Film.objects.filter(external_id__gte=FIRST_ID)
+    titles = [film.name for film in films.order_by("?")[: args.queries]]
+    queries = [
+        random.choice(
+            [
+                name,
+                random.choice(LAST_NAMES),
+                f"{name.split()[0]} {random.choice(LAST_NAMES)}",
+            ]
+        )
+        for name in titles
+    ]
+    try:
+        measure("icontains", scan, queries[: max(1, args.queries // 4)])
+        measure("search_films", search_films, queries)
+    finally:
+        if not args.keep:
+            Film.objects.filter(external_id__gte=FIRST_ID).delete()
+            MovieMaker.objects.filter(external_id__gte=FIRST_ID).delete()
+
+    print(f"{connection.vendor}, {total} films")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,164 @@
 import os
-from threading import Thread
+from functools import wraps
 
-import schedule
+import colorama
 import telebot
+from django.db import close_old_connections
 
 import init_django_orm  # noqa: F401
-from db.models import Film
+from bot.posts import PostQueue
+from bot.scheduler import Scheduler
+from metrics import logger
+from search import search_films
+from similar import similar_films
+
+
+def recycle_connections(func: callable) -> callable:
+    """
+    Close the expired database connections of the calling thread around ``func``,
+    like Django does around a request.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return wrapper
 
 
 class FilmBot:
-    def __init__(self, token, chat_id):
-        self.bot = telebot.TeleBot(token)
+    """
+    Updates are received by the polling thread and every handler runs in a pool
+    of ``workers`` threads, so a slow database query in one handler does not delay
+    the other updates.
+    """
+
+    def __init__(
+        self,
+        token,
+        chat_id=None,
+        times: tuple[str] = ("19:42",),
+        workers: int = 8,
+    ):
+        self.bot = telebot.TeleBot(token, num_threads=workers)
         self.chat_id = chat_id
+        self.channels = {}
+        self.scheduler = Scheduler()
+        if chat_id is not None:
+            self.add_channel(chat_id, times)
+
+        self.command("start")(self._start)
+        self.command("search")(self._search)
+        self.command("similar")(self._similar)
+
+    def command(self, *commands: str):
+        """
+        Register a handler of the given commands, e.g.::
+
+            @film_bot.command("search")
+            def search(message): ...
+
+        The handler runs in the worker pool. Database connections of the worker
+        thread are recycled around it like Django does around a request.
+        """
+
+        def decorator(handler: callable) -> callable:
+            self.bot.register_message_handler(
+                recycle_connections(handler), commands=list(commands)
+            )
+            return handler
+
+        return decorator
+
+    def add_channel(self, chat_id, times: tuple[str] = ("19:42",), **queue_options):
+        """
+        Post a film to ``chat_id`` every day at each of ``times`` ("HH:MM").
+        The scheduler thread sleeps for hours between the posts, so its database
+        connections are recycled around every post like in the handlers.
+        """
+        if chat_id not in self.channels:
+            self.channels[chat_id] = PostQueue(chat_id, **queue_options)
+        post = recycle_connections(self._sen_film_every_day)
+        for at in times:
+            self.scheduler.every_day(at, post, chat_id)
 
     def start(self):
-        @self.bot.message_handler(commands=["start"])
-        def start(message):
-            self.bot.send_message(message.chat.id, message)
-
-        Thread(target=self._scheduler, args=()).start()
-        self.bot.polling(non_stop=True)
-
-    def _sen_film_every_day(self):
-        film = Film.objects.filter(rating__gte=7).order_by("?").first()
-        with open("../templates/main.html", "rt", encoding="utf-8") as file:
-            template = file.read()
-        actors = [f"#{actor.name.split()[-1]}" for actor in film.actors.all()]
-
-        message = template.format(
-            name=film.name,
-            release=film.release.year,
-            trailer=film.trailer,
-            description=film.description,
-            actors=", ".join(actors),
+        for posts in self.channels.values():
+            posts.start()
+        self.scheduler.start()
+        try:
+            self.bot.polling(non_stop=True)
+        finally:
+            self.scheduler.stop()
+            for posts in self.channels.values():
+                posts.stop()
+
+    def stop(self):
+        """
+        Stop polling, ``start`` then stops the scheduler and returns.
+        """
+        self.bot.stop_polling()
+
+    def _start(self, message):
+        self.bot.send_message(message.chat.id, message)
+
+    def _search(self, message):
+        query = telebot.util.extract_arguments(message.text)
+        if not query:
+            self.bot.reply_to(message, "/search <название фильма или актёр>")
+            return
+
+        films = search_films(query, limit=10)
+        if not films:
+            self.bot.reply_to(message, "Ничего не найдено")
+            return
+
+        self.bot.reply_to(
+            message,
+            "\n".join(
+                f"{film.name} ({film.release.year})" if film.release else film.name
+                for film in films
+            ),
+        )
+
+    def _similar(self, message):
+        query = telebot.util.extract_arguments(message.text)
+        films = search_films(query, limit=1) if query else []
+        if not films:
+            self.bot.reply_to(message, "/similar <название фильма>")
+            return
+
+        film = films[0]
+        similar = similar_films(film, limit=10)
+        if not similar:
+            self.bot.reply_to(message, f"Похожих на «{film.name}» пока нет")
+            return
+
+        self.bot.reply_to(
+            message,
+            f"Похожие на «{film.name}»:\n"
+            + "\n".join(
+                f"{other.name} ({other.release.year})" if other.release else other.name
+                for other in similar
+            ),
         )
 
-        self.bot.send_message(self.chat_id, message, parse_mode="HTML")
+    def _sen_film_every_day(self, chat_id):
+        posts = self.channels[chat_id]
+        post = posts.pop()
+        if post is None:
+            # The background thread has not rendered anything yet
+            logger.warning("Post queue is empty", extra={"color": colorama.Fore.YELLOW})
+            posts.fill()
+            post = posts.pop()
+            if post is None:
+                return
 
-    def _scheduler(self):
-        schedule.every().day.at("19:42").do(self._sen_film_every_day)
-        while True:
-            schedule.run_pending()
+        self.bot.send_message(chat_id, post.text, parse_mode="HTML")
 
 
 if __name__ == "__main__":
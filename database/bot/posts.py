@@ -0,0 +1,159 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import cache
+from pathlib import Path
+
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+import init_django_orm  # noqa: F401
+from db.models import Film, PostedFilm
+from metrics import logger
+from trailers import resolve_trailer
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+
+@cache
+def load_template(name: str = "main.html") -> str:
+    """
+    Read a post template once, later calls return the cached text.
+    """
+    return (TEMPLATES_DIR / name).read_text(encoding="utf-8")
+
+
+def render_post(film: Film, template: str) -> str:
+    actors = [f"#{actor.name.split()[-1]}" for actor in film.actors.all()]
+    return template.format(
+        name=film.name,
+        release=film.release.year,
+        trailer=resolve_trailer(film),
+        description=film.description,
+        actors=", ".join(actors),
+    )
+
+
+@dataclass(frozen=True)
+class Post:
+    film_id: int
+    text: str
+
+
+class PostQueue:
+    """
+    The next ``size`` posts of a chat, rendered in advance by a background thread.
+
+    ``pop`` only takes the first rendered post, it does not touch the database.
+    Popped films are saved to the posting history by the background thread, which
+    then renders a replacement. Films posted to the chat within ``repeat_after``
+    or already queued are not picked again.
+    """
+
+    def __init__(
+        self,
+        chat_id,
+        size: int = 7,
+        min_rating: float = 7,
+        repeat_after: timedelta = timedelta(days=365),
+        template: str = "main.html",
+        refill_every: float = 3600,
+    ):
+        self.chat_id = str(chat_id)
+        self.size = size
+        self.min_rating = min_rating
+        self.repeat_after = repeat_after
+        self.template = template
+        self.refill_every = refill_every
+        self._posts = deque()
+        self._posted = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._posts)
+
+    def candidates(self):
+        recent = PostedFilm.objects.filter(
+            chat_id=self.chat_id, posted_at__gte=timezone.now() - self.repeat_after
+        ).values("film_id")
+        return (
+            Film.objects.filter(rating__gte=self.min_rating, release__isnull=False)
+            .exclude(pk__in=recent)
+            .exclude(pk__in=[post.film_id for post in list(self._posts)])
+        )
+
+    def fill(self) -> int:
+        """
+        Save the posting history and render posts until the queue is full.
+        Return the number of rendered posts.
+        """
+        with self._lock:
+            self._save_posted()
+
+            picked = []
+            candidates = self.candidates()
+            for _ in range(self.size - len(self._posts)):
+                film = candidates.exclude(pk__in=picked).random()
+                if film is None:
+                    break
+                picked.append(film.pk)
+
+            films = Film.objects.filter(pk__in=picked).prefetch_related("actors")
+            films = {film.pk: film for film in films}
+            template = load_template(self.template)
+            for pk in picked:
+                self._posts.append(Post(pk, render_post(films[pk], template)))
+            return len(picked)
+
+    def pop(self) -> Post | None:
+        """
+        Take the next post and let the background thread replace it.
+        """
+        try:
+            post = self._posts.popleft()
+        except IndexError:
+            return None
+        self._posted.append(post.film_id)
+        self._wake.set()
+        return post
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            self._save_posted()
+
+    def _save_posted(self):
+        film_ids = []
+        while self._posted:
+            film_ids.append(self._posted.popleft())
+        PostedFilm.objects.bulk_create(
+            [PostedFilm(film_id=film_id, chat_id=self.chat_id) for film_id in film_ids]
+        )
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wake.clear()
+                # The thread sleeps for hours, its connection may be closed by then
+                close_old_connections()
+                try:
+                    self.fill()
+                except Exception as e:
+                    logger.error(str(e))
+                finally:
+                    close_old_connections()
+                self._wake.wait(self.refill_every)
+        finally:
+            connection.close()
@@ -0,0 +1,61 @@
+import threading
+
+import schedule
+
+from metrics import logger
+
+
+class Scheduler:
+    """
+    Run ``schedule`` jobs in a background thread that sleeps until the next job
+    is due instead of polling ``run_pending`` in a loop.
+
+    The sleep is capped by ``max_sleep`` so a change of the system clock is
+    noticed, and adding a job or stopping wakes the thread at once.
+    """
+
+    def __init__(self, max_sleep: float = 600):
+        self.max_sleep = max_sleep
+        self.jobs = schedule.Scheduler()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def every_day(self, at: str, job: callable, *args, **kwargs) -> schedule.Job:
+        """
+        Run ``job(*args, **kwargs)`` every day at ``at`` ("HH:MM").
+        """
+        scheduled = self.jobs.every().day.at(at).do(self._safe, job, *args, **kwargs)
+        self._wake.set()
+        return scheduled
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler")
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def sleep_time(self) -> float:
+        idle = self.jobs.idle_seconds
+        if idle is None:
+            return self.max_sleep
+        return min(max(idle, 0), self.max_sleep)
+
+    @staticmethod
+    def _safe(job: callable, *args, **kwargs):
+        # One failed post must not stop the jobs of the following days
+        try:
+            return job(*args, **kwargs)
+        except Exception as e:
+            logger.error(str(e))
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.clear()
+            self.jobs.run_pending()
+            self._wake.wait(self.sleep_time())
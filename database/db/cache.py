@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+from django.db import models, transaction
+
+from db.models import Dubbing, Genre, MovieMaker, Profession
+
+
+class EntityCache:
+    """
+    In-process key -> pk cache for one model.
+
+    Lookups only query the database for keys that are not cached yet. Pks read or
+    created inside a transaction are added to the cache once it commits, so a rolled
+    back batch never leaves unknown pks behind. Call clear() after deleting rows.
+    """
+
+    def __init__(self, model: type[models.Model], field: str, maxsize: int = None):
+        self.model = model
+        self.field = field
+        self.maxsize = maxsize
+        self._pks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pks)
+
+    def _store(self, mapping: dict):
+        with self._lock:
+            self._pks.update(mapping)
+            if self.maxsize is None:
+                return
+            for key in mapping:
+                self._pks.move_to_end(key)
+            while len(self._pks) > self.maxsize:
+                self._pks.popitem(last=False)
+
+    def _store_on_commit(self, mapping: dict):
+        # The rows may have been created by the transaction that is still open
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._store(mapping))
+        else:
+            self._store(mapping)
+
+    def _cached(self, keys: set) -> dict:
+        with self._lock:
+            found = {key: self._pks[key] for key in keys if key in self._pks}
+            if self.maxsize is not None:
+                for key in found:
+                    self._pks.move_to_end(key)
+        return found
+
+    def warm_up(self):
+        """
+        Load the whole table. Only meant for small reference tables.
+        """
+        self._store_on_commit(dict(self.model.objects.values_list(self.field, "pk")))
+
+    def get_many(self, keys: Iterable[Hashable]) -> dict:
+        """
+        Return key -> pk for the keys that exist in the database.
+        """
+        keys = set(keys)
+        found = self._cached(keys)
+
+        missing = keys - found.keys()
+        if missing:
+            loaded = dict(
+                self.model.objects.filter(**{f"{self.field}__in": missing}).values_list(
+                    self.field, "pk"
+                )
+            )
+            self._store_on_commit(loaded)
+            found.update(loaded)
+
+        return found
+
+    def get_or_create_many(
+        self, keys: Iterable[Hashable], defaults: dict = None
+    ) -> dict:
+        """
+        Return key -> pk for all keys, creating the rows that do not exist yet.
+
+        :param defaults: key -> dict of other field values for the new rows.
+        """
+        keys = set(keys)
+        found = self.get_many(keys)
+
+        missing = keys - found.keys()
+        if missing:
+            defaults = defaults or {}
+            self.model.objects.bulk_create(
+                [
+                    self.model(**{**defaults.get(key, {}), self.field: key})
+                    for key in missing
+                ],
+                ignore_conflicts=True,
+            )
+            created = dict(
+                self.model.objects.filter(**{f"{self.field}__in": missing}).values_list(
+                    self.field, "pk"
+                )
+            )
+            self._store_on_commit(created)
+            found.update(created)
+
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._pks.clear()
+
+
+class NameCache(EntityCache):
+    """
+    Cache of a small reference table keyed by its unique name.
+
+    The whole table is loaded on first use and then kept up to date by
+    get_or_create_many. Names missing from the cache are still looked up in
+    the database, e.g. a genre added by another process after the warm-up.
+    """
+
+    def __init__(self, model: type[models.Model]):
+        super().__init__(model, "name")
+        self._warm = False
+
+    def _cached(self, keys: set) -> dict:
+        if not self._warm:
+            self.warm_up()
+            self._warm = True
+        return super()._cached(keys)
+
+    def clear(self):
+        super().clear()
+        self._warm = False
+
+
+genres = NameCache(Genre)
+professions = NameCache(Profession)
+dubbings = NameCache(Dubbing)
+# MovieMaker can grow to millions of rows, only recently used ones are kept
+movie_makers = EntityCache(MovieMaker, "external_id", maxsize=200_000)
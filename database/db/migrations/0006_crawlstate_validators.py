@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0005_crawlstate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="crawlstate",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="crawlstate",
+            name="etag",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="crawlstate",
+            name="last_modified",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0006_crawlstate_validators"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="moviemaker",
+            name="enriched_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
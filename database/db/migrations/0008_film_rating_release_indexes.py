@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0007_moviemaker_enriched_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="film",
+            index=models.Index(fields=["rating"], name="db_film_rating_4f2515_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="film",
+            index=models.Index(fields=["release"], name="db_film_release_ed6726_idx"),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0008_film_rating_release_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostedFilm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("chat_id", models.CharField(max_length=64)),
+                ("posted_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "film",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="posts",
+                        to="db.film",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="postedfilm",
+            index=models.Index(
+                fields=["chat_id", "posted_at"], name="db_postedfi_chat_id_e2dcea_idx"
+            ),
+        ),
+    ]
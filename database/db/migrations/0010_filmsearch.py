@@ -0,0 +1,91 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Full-text index over FilmSearch.document: an FTS5 table kept in sync by triggers
+# on SQLite, a trigram index on PostgreSQL. Other backends search without an index.
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE db_filmsearch_fts USING fts5(
+        document,
+        content='db_filmsearch',
+        content_rowid='film_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER db_filmsearch_ai AFTER INSERT ON db_filmsearch BEGIN
+        INSERT INTO db_filmsearch_fts(rowid, document)
+        VALUES (new.film_id, new.document);
+    END
+    """,
+    """
+    CREATE TRIGGER db_filmsearch_ad AFTER DELETE ON db_filmsearch BEGIN
+        INSERT INTO db_filmsearch_fts(db_filmsearch_fts, rowid, document)
+        VALUES ('delete', old.film_id, old.document);
+    END
+    """,
+    """
+    CREATE TRIGGER db_filmsearch_au AFTER UPDATE ON db_filmsearch BEGIN
+        INSERT INTO db_filmsearch_fts(db_filmsearch_fts, rowid, document)
+        VALUES ('delete', old.film_id, old.document);
+        INSERT INTO db_filmsearch_fts(rowid, document)
+        VALUES (new.film_id, new.document);
+    END
+    """,
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS db_filmsearch_ai",
+    "DROP TRIGGER IF EXISTS db_filmsearch_ad",
+    "DROP TRIGGER IF EXISTS db_filmsearch_au",
+    "DROP TABLE IF EXISTS db_filmsearch_fts",
+]
+POSTGRES_INDEX = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX db_filmsearch_document_trgm
+    ON db_filmsearch USING gin (document gin_trgm_ops)
+    """,
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS db_filmsearch_document_trgm"]
+
+
+def execute(schema_editor, statements: dict):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_index(apps, schema_editor):
+    execute(schema_editor, {"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX})
+
+
+def drop_index(apps, schema_editor):
+    execute(schema_editor, {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0009_postedfilm"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FilmSearch",
+            fields=[
+                (
+                    "film",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search",
+                        serialize=False,
+                        to="db.film",
+                    ),
+                ),
+                ("document", models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0010_filmsearch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarFilm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                (
+                    "film",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_films",
+                        to="db.film",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="db.film",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="similarfilm",
+            constraint=models.UniqueConstraint(
+                fields=("film", "similar"), name="unique_similar_film"
+            ),
+        ),
+    ]
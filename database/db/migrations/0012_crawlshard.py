@@ -0,0 +1,56 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0011_similarfilm"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrawlShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("first_id", models.IntegerField(unique=True)),
+                ("stop_id", models.IntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("claimed", "Claimed"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("rate", models.FloatField(default=1.0)),
+                ("owner", models.CharField(blank=True, max_length=255, null=True)),
+                ("attempts", models.IntegerField(default=0)),
+                ("processed", models.IntegerField(default=0)),
+                ("films", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True, null=True)),
+                ("heartbeat_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="crawlshard",
+            index=models.Index(
+                fields=["status", "first_id"], name="db_crawlsha_status_6cc008_idx"
+            ),
+        ),
+    ]
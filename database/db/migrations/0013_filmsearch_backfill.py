@@ -0,0 +1,47 @@
+from django.db import migrations
+
+from db.queries import keyset_chunks
+
+CHUNK_SIZE = 1000
+
+
+def index_saved_films(apps, schema_editor):
+    """
+    Write the search documents of the films saved before FilmSearch existed,
+    the same text as search.build_documents builds for new ones.
+    """
+    Film = apps.get_model("db", "Film")
+    FilmSearch = apps.get_model("db", "FilmSearch")
+    relations = [
+        Film._meta.get_field(name).remote_field.through
+        for name in ("actors", "directors")
+    ]
+
+    films = Film.objects.filter(search__isnull=True).values_list(
+        "pk", "name", "original_name"
+    )
+    for chunk in keyset_chunks(films, chunk_size=CHUNK_SIZE):
+        names = {pk: [name, original_name] for pk, name, original_name in chunk}
+        for through in relations:
+            for film_id, maker_name in through.objects.filter(
+                film_id__in=names
+            ).values_list("film_id", "moviemaker__name"):
+                names[film_id].append(maker_name)
+
+        FilmSearch.objects.bulk_create(
+            [
+                FilmSearch(film_id=pk, document=" ".join(filter(None, parts)))
+                for pk, parts in names.items()
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0012_crawlshard"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_saved_films, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("db", "0013_filmsearch_backfill"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="moviemaker",
+            name="enrich_failed",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import random
+
 from django.db import models
 from django_countries.fields import CountryField
 
@@ -29,6 +31,10 @@ class MovieMaker(models.Model):
     original_name = models.CharField(max_length=255, null=True)
     birth_date = models.DateField(null=True, default=None)
     profession = models.ManyToManyField(Profession, related_name="workers", default=3)
+    # Set once the profile page of the maker was parsed
+    enriched_at = models.DateTimeField(null=True, blank=True)
+    # Set when the profile page could not be parsed, so it is not requested again
+    enrich_failed = models.BooleanField(default=False)
 
     class Meta:
         verbose_name = "movie_maker"
@@ -38,6 +44,34 @@ class MovieMaker(models.Model):
         return f"{self.name} ({self.birth_date})"
 
 
+class FilmQuerySet(models.QuerySet):
+    def random(self, attempts: int = 20):
+        """
+        Return a random film of the queryset, every film with the same chance,
+        or None if it is empty.
+
+        Instead of sorting the whole table with ORDER BY RANDOM(), a random pk is
+        drawn between the lowest and the highest one and looked up in the queryset
+        through the primary key index. Draws landing on a gap or on a film outside
+        the queryset are repeated, so the pick is uniform. After ``attempts`` misses
+        (a very selective filter) the queryset is counted and a film is read at a
+        random offset instead.
+        """
+        # The bounds of the whole table, two reads of the primary key index
+        pks = self.model.objects.order_by("pk").values_list("pk", flat=True)
+        first, last = pks.first(), pks.last()
+        if first is None:
+            return None
+
+        for _ in range(attempts):
+            film = self.filter(pk=random.randint(first, last)).first()
+            if film is not None:
+                return film
+
+        count = self.count()
+        return self.order_by("pk")[random.randrange(count)] if count else None
+
+
 class Film(models.Model):
     external_id = models.IntegerField(unique=True)
     name = models.CharField(max_length=255)
@@ -55,8 +89,130 @@ class Film(models.Model):
     duration = models.IntegerField(null=True)
     age_limit = models.IntegerField(null=True)
 
+    objects = FilmQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name}, ({self.release})"
 
     class Meta:
         default_related_name = "films"
+        indexes = [
+            models.Index(fields=["rating"]),
+            models.Index(fields=["release"]),
+        ]
+
+
+class FilmSearch(models.Model):
+    """
+    Searchable text of a film: its names and the names of its actors and directors.
+    Filled by search.index_films, the full-text index over it depends on the backend.
+    """
+
+    film = models.OneToOneField(
+        Film, on_delete=models.CASCADE, primary_key=True, related_name="search"
+    )
+    document = models.TextField()
+
+    def __str__(self):
+        return f"{self.film_id}: {self.document[:50]}"
+
+
+class SimilarFilm(models.Model):
+    """
+    One of the most similar films of a film, precomputed by similar.py.
+    """
+
+    film = models.ForeignKey(
+        Film, on_delete=models.CASCADE, related_name="similar_films"
+    )
+    similar = models.ForeignKey(Film, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["film", "similar"], name="unique_similar_film"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.film_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
+class CrawlState(models.Model):
+    """
+    Crawl status of a film page, so a crawl can resume without rescanning the catalogue.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        DONE = "done"
+        NOT_FOUND = "404"
+        FAILED = "failed"
+
+    external_id = models.IntegerField(unique=True)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.IntegerField(default=0)
+    etag = models.CharField(max_length=255, null=True, blank=True)
+    last_modified = models.CharField(max_length=64, null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "external_id"])]
+
+    def __str__(self):
+        return f"#{self.external_id} {self.status}"
+
+
+class CrawlShard(models.Model):
+    """
+    A range of external ids crawled by one worker process at a time.
+    Workers on any machine claim shards from this table and report their progress.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        CLAIMED = "claimed"
+        DONE = "done"
+        FAILED = "failed"
+
+    first_id = models.IntegerField(unique=True)
+    stop_id = models.IntegerField()
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    # Requests per second shared by all workers crawling the shards
+    rate = models.FloatField(default=1.0)
+    owner = models.CharField(max_length=255, null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    films = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "first_id"])]
+
+    def __str__(self):
+        return f"[{self.first_id}, {self.stop_id}) {self.status}"
+
+
+class PostedFilm(models.Model):
+    """
+    A film posted by the bot to a chat, so it is not posted there again too soon.
+    """
+
+    film = models.ForeignKey(Film, on_delete=models.CASCADE, related_name="posts")
+    chat_id = models.CharField(max_length=64)
+    posted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["chat_id", "posted_at"])]
+
+    def __str__(self):
+        return f"{self.film_id} -> {self.chat_id} ({self.posted_at})"
@@ -0,0 +1,53 @@
+from itertools import islice
+from typing import Iterable, Iterator
+
+from django.db import models
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    """
+    Split items into lists of at most ``size`` items, e.g. to keep IN clauses short.
+    """
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def keyset_chunks(
+    queryset: models.QuerySet, field: str = "pk", chunk_size: int = 1000
+) -> Iterator[list]:
+    """
+    Yield the rows of a queryset in chunks ordered by ``field``, each one read with
+    ``field > last value of the previous chunk``. Rows updated or added while
+    iterating do not shift the chunks and no cursor is kept open between them.
+
+    Rows can be model instances, dicts, flat values or tuples starting with
+    ``field``, e.g. ``values_list("pk", "external_id")``.
+    """
+    last = None
+    while True:
+        rows = queryset.order_by(field)
+        if last is not None:
+            rows = rows.filter(**{f"{field}__gt": last})
+        chunk = list(rows[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+
+        row = chunk[-1]
+        if isinstance(row, models.Model):
+            last = getattr(row, field)
+        elif isinstance(row, dict):
+            last = row[field]
+        elif isinstance(row, tuple):
+            last = row[0]
+        else:
+            last = row
+
+
+def through_table(model: type[models.Model], relation: str) -> tuple[type, str]:
+    """
+    Through model of a many-to-many relation and its column of the related rows.
+    """
+    field = getattr(model, relation).field
+    return field.remote_field.through, field.m2m_reverse_name()
@@ -0,0 +1,190 @@
+from itertools import islice
+from typing import Iterator
+
+import colorama
+import requests
+from django.db import transaction
+from django.utils import timezone
+
+import init_django_orm  # noqa: F401
+
+from db import cache
+from db.models import MovieMaker
+from db.queries import keyset_chunks
+from hdrezka_parser.limiter import rate_limiter
+from hdrezka_parser.parser import Maker
+from ingest import add_maker_professions, prepare_movie_maker
+from metrics import logger
+from pipeline import Pipeline, Stage
+from search import index_makers
+from utils import Timer
+
+# Profile fields taken from the maker page, the name included as it can be fuller
+PROFILE_FIELDS = ("name", "original_name", "birth_date", "enriched_at")
+
+
+def makers_to_enrich(limit: int = None, chunk_size: int = 5000) -> Iterator[int]:
+    """
+    Yield external ids of moviemakers whose profile page was never parsed
+    and did not fail to parse, keyset-paginated so makers enriched while iterating
+    do not shift the pages.
+    """
+    makers = MovieMaker.objects.filter(
+        enriched_at__isnull=True, enrich_failed=False
+    ).values_list("pk", "external_id")
+    for chunk in keyset_chunks(makers, chunk_size=chunk_size):
+        for _, external_id in chunk:
+            yield external_id
+
+
+def write_makers(profiles: list[dict]):
+    """
+    Save a batch of parsed profiles with one bulk update and one bulk insert
+    of the profession links. Films of the makers whose name changed are reindexed.
+    """
+    if not profiles:
+        return
+
+    prepared = [prepare_movie_maker(profile) for profile in profiles]
+    maker_ids = cache.movie_makers.get_many(
+        fields["external_id"] for fields, _ in prepared
+    )
+    now = timezone.now()
+
+    old_names = dict(
+        MovieMaker.objects.filter(pk__in=maker_ids.values()).values_list("pk", "name")
+    )
+
+    makers = []
+    professions = {}
+    for fields, names in prepared:
+        pk = maker_ids.get(fields["external_id"])
+        if pk is None:
+            continue
+        makers.append(MovieMaker(pk=pk, **fields, enriched_at=now))
+        professions[pk] = names
+
+    with transaction.atomic():
+        MovieMaker.objects.bulk_update(makers, PROFILE_FIELDS)
+        add_maker_professions(professions)
+        index_makers(maker.pk for maker in makers if maker.name != old_names[maker.pk])
+
+
+def mark_missing(external_ids: list[int]):
+    """
+    Makers without a profile page are not requested again.
+    """
+    if not external_ids:
+        return
+    MovieMaker.objects.filter(external_id__in=external_ids).update(
+        enriched_at=timezone.now()
+    )
+
+
+def mark_failed(external_ids: list[int]):
+    """
+    Makers whose profile page could not be parsed are skipped by the next runs.
+    Reset enrich_failed to request them again, e.g. after fixing the parser.
+    """
+    if not external_ids:
+        return
+    MovieMaker.objects.filter(external_id__in=external_ids).update(enrich_failed=True)
+
+
+def fetch_maker(external_id: int) -> tuple[int, dict | Exception]:
+    """
+    Download and parse a profile page. A missing page or unexpected markup
+    is returned instead of raised.
+    """
+    try:
+        return external_id, Maker(external_id).parse_page()
+    except (requests.exceptions.HTTPError, AttributeError) as e:
+        return external_id, e
+
+
+class MakerBatcher:
+    """
+    Pipeline stage collecting parsed profiles, missing and unparsable pages
+    into batches for the write stage.
+    """
+
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+        self.profiles, self.missing, self.failed = [], [], []
+
+    def __call__(self, fetched: tuple[int, dict | Exception]):
+        external_id, profile = fetched
+        if isinstance(profile, requests.exceptions.HTTPError):
+            self.missing.append(external_id)
+        elif isinstance(profile, AttributeError):
+            logger.warning(f"bad parser maker #{external_id}")
+            self.failed.append(external_id)
+        else:
+            self.profiles.append(profile)
+
+        if len(self.profiles) + len(self.missing) + len(self.failed) >= self.batch_size:
+            return self.flush()
+        return None
+
+    def flush(self) -> dict | None:
+        if not (self.profiles or self.missing or self.failed):
+            return None
+
+        batch = {
+            "profiles": self.profiles,
+            "missing": self.missing,
+            "failed": self.failed,
+        }
+        self.profiles, self.missing, self.failed = [], [], []
+        return batch
+
+
+def write_batch(batch: dict) -> int:
+    """
+    Save a batch of the MakerBatcher and return the number of enriched makers.
+    """
+    write_makers(batch["profiles"])
+    mark_missing(batch["missing"])
+    mark_failed(batch["failed"])
+    return len(batch["profiles"])
+
+
+@Timer()
+def enrich_makers(
+    limit: int = None,
+    workers: int = 4,
+    rate: float = 1.0,
+    batch_size: int = 100,
+):
+    """
+    Background job filling birth date, original name and the full profession list
+    of moviemakers from their profile pages.
+
+    Pages are fetched concurrently under the shared rate limit and saved in batches.
+    If the run stops on an error, the profiles parsed before it are still saved.
+    """
+    rate_limiter.configure(rate=rate)
+    batcher = MakerBatcher(batch_size=batch_size)
+    enriched = []
+
+    def write(batch: dict):
+        enriched.append(write_batch(batch))
+
+    ids = makers_to_enrich()
+    if limit is not None:
+        ids = islice(ids, limit)
+
+    pipeline = Pipeline(
+        [
+            Stage("fetch", fetch_maker, workers, skip_on_stop=True),
+            Stage("batch", batcher, 1, flush=batcher.flush),
+            Stage("write", write, 1),
+        ]
+    )
+    try:
+        pipeline.run(ids)
+    finally:
+        logger.info(
+            f"{sum(enriched)} moviemakers enriched",
+            extra={"color": colorama.Fore.GREEN},
+        )
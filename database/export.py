@@ -0,0 +1,185 @@
+"""
+Streaming export of the catalogue for analytics: every film with its genres,
+actors, directors and dubbing, one row per film.
+
+Films are read in keyset-paginated chunks and the relations of a chunk with one
+join over each through table, so memory stays bounded by the chunk size and the
+number of queries by the number of chunks. Output is JSON Lines (gzip compressed
+for a ``.gz`` path) or Parquet, one row group per chunk, which needs pyarrow.
+
+    python export.py films.parquet
+    python export.py films.jsonl.gz --chunk-size 5000
+"""
+
+import argparse
+import gzip
+import json
+from pathlib import Path
+from time import monotonic
+from typing import Iterator
+
+import colorama
+
+import init_django_orm  # noqa: F401
+
+from db.models import Film
+from db.queries import keyset_chunks, through_table
+from metrics import logger
+from utils import Timer
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FIELDS = [field.attname for field in Film._meta.concrete_fields]
+
+# Relation -> fields of the related rows, a single field is exported as a plain list
+RELATIONS = {
+    "genres": ("name",),
+    "actors": ("external_id", "name"),
+    "directors": ("external_id", "name"),
+    "dubbing": ("name",),
+}
+
+
+def film_rows(chunk_size: int = 1000) -> Iterator[list[dict]]:
+    """
+    Yield the films in chunks of rows ordered by pk.
+    """
+    for rows in keyset_chunks(Film.objects.values(*FIELDS), "id", chunk_size):
+        films = {row["id"]: row for row in rows}
+        for relation, fields in RELATIONS.items():
+            for row in films.values():
+                row[relation] = []
+            through, column = through_table(Film, relation)
+            related = through.objects.filter(film_id__in=films).values_list(
+                "film_id", *(f"{column}__{field}" for field in fields)
+            )
+            for film_id, *values in related.order_by("pk"):
+                films[film_id][relation].append(
+                    values[0] if len(fields) == 1 else dict(zip(fields, values))
+                )
+
+        yield rows
+
+
+class JsonLinesWriter:
+    def __init__(self, path: Path):
+        self.file = (
+            gzip.open(path, "wt", encoding="utf-8")
+            if path.suffix == ".gz"
+            else open(path, "wt", encoding="utf-8")
+        )
+
+    def write(self, rows: list[dict]):
+        self.file.writelines(
+            json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    TYPES = {
+        "AutoField": "int64",
+        "BigAutoField": "int64",
+        "IntegerField": "int64",
+        "FloatField": "float64",
+        "DateField": "date32",
+    }
+
+    def __init__(self, path: Path, compression: str = "zstd"):
+        if pyarrow is None:
+            raise ImportError("Parquet export needs the pyarrow package")
+        self.schema = self.build_schema()
+        self.writer = pyarrow.parquet.ParquetWriter(
+            path, self.schema, compression=compression
+        )
+
+    @classmethod
+    def build_schema(cls):
+        columns = []
+        for field in Film._meta.concrete_fields:
+            type_name = cls.TYPES.get(field.get_internal_type(), "string")
+            columns.append((field.attname, getattr(pyarrow, type_name)()))
+
+        for relation, fields in RELATIONS.items():
+            if len(fields) == 1:
+                columns.append((relation, pyarrow.list_(pyarrow.string())))
+                continue
+            maker = pyarrow.struct(
+                [("external_id", pyarrow.int64()), ("name", pyarrow.string())]
+            )
+            columns.append((relation, pyarrow.list_(maker)))
+        return pyarrow.schema(columns)
+
+    def write(self, rows: list[dict]):
+        self.writer.write_table(pyarrow.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "parquet": ParquetWriter}
+
+
+def writer_for(path: Path, format: str = None):
+    if format is None:
+        suffixes = [suffix.lstrip(".") for suffix in path.suffixes]
+        format = "parquet" if "parquet" in suffixes else "jsonl"
+    try:
+        return WRITERS[format](path)
+    except KeyError:
+        raise ValueError(f"Unknown export format: {format}")
+
+
+@Timer()
+def export_films(
+    path: str | Path,
+    format: str = None,
+    chunk_size: int = 1000,
+    report_every: float = 10,
+) -> int:
+    """
+    Write every film to ``path`` as JSON Lines or Parquet (by default taken from
+    the file name) and log the throughput. Return the number of exported films.
+    """
+    path = Path(path)
+    writer = writer_for(path, format)
+    started = reported = monotonic()
+    exported = 0
+
+    def report():
+        elapsed = monotonic() - started
+        size = path.stat().st_size / 2**20 if path.exists() else 0
+        logger.info(
+            f"{exported} films exported, {exported / elapsed:.0f} films/sec, "
+            f"{size:.1f} MB written",
+            extra={"color": colorama.Fore.MAGENTA},
+        )
+
+    try:
+        for rows in film_rows(chunk_size):
+            writer.write(rows)
+            exported += len(rows)
+            if monotonic() - reported >= report_every:
+                report()
+                reported = monotonic()
+    finally:
+        writer.close()
+
+    report()
+    return exported
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("path")
+    arg_parser.add_argument("--format", choices=list(WRITERS))
+    arg_parser.add_argument("--chunk-size", type=int, default=1000)
+    args = arg_parser.parse_args()
+
+    export_films(args.path, args.format, args.chunk_size)
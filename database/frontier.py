@@ -0,0 +1,151 @@
+from typing import Iterable, Iterator
+
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+import init_django_orm  # noqa: F401
+
+from db.models import CrawlState, Film
+from db.queries import keyset_chunks
+
+Status = CrawlState.Status
+
+
+class CrawlFrontier:
+    """
+    Persistent crawl state of film ids stored in the CrawlState table.
+
+    Every crawled id is recorded as done, 404 or failed, so a crawl resumes by
+    reading only the pending and failed rows, and known missing pages are never
+    fetched again.
+    """
+
+    def __init__(self, chunk_size: int = 5000, max_attempts: int = 3):
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        # Every id below it has a state row, so seed skips them
+        self._seeded = 1
+
+    def last_id(self) -> int:
+        return CrawlState.objects.aggregate(last=Max("external_id"))["last"] or 0
+
+    def seed(self, stop: int = None):
+        """
+        Record every id below ``stop`` that has no state yet: ids of saved films
+        as done, the rest as pending. By default seeds up to the last saved film.
+
+        Ids get a state row when they are marked too, so gaps can be left below
+        the highest known id. One query counts the rows of every chunk and only
+        the chunks missing some are filled. The highest seeded id is kept, so the
+        next calls of the process only look at the ids past it.
+        """
+        if stop is None:
+            last_film = Film.objects.aggregate(last=Max("external_id"))["last"]
+            stop = (last_film or 0) + 1
+        if stop <= self._seeded:
+            return
+
+        # Start at the chunk of the mark, chunks are aligned on id 1
+        start = self._seeded - (self._seeded - 1) % self.chunk_size
+        complete = {
+            row["chunk"]
+            for row in CrawlState.objects.filter(
+                external_id__gte=start, external_id__lt=stop
+            )
+            .annotate(chunk=(F("external_id") - 1) / self.chunk_size)
+            .values("chunk")
+            .annotate(count=Count("id"))
+            if row["count"] == self.chunk_size
+        }
+
+        for first in range(start, stop, self.chunk_size):
+            if (first - 1) // self.chunk_size in complete:
+                continue
+            last = min(first + self.chunk_size, stop)
+            known = set(
+                CrawlState.objects.filter(
+                    external_id__gte=first, external_id__lt=last
+                ).values_list("external_id", flat=True)
+            )
+            if len(known) == last - first:
+                continue
+            done = set(
+                Film.objects.filter(
+                    external_id__gte=first, external_id__lt=last
+                ).values_list("external_id", flat=True)
+            )
+            CrawlState.objects.bulk_create(
+                [
+                    CrawlState(
+                        external_id=external_id,
+                        status=Status.DONE if external_id in done else Status.PENDING,
+                    )
+                    for external_id in range(first, last)
+                    if external_id not in known
+                ],
+                ignore_conflicts=True,
+            )
+        self._seeded = stop
+
+    def unknown(self, ids: range) -> Iterator[int]:
+        """
+        Yield the ids of a range that are not known to be done or missing,
+        e.g. to crawl a range without fetching known 404 pages again.
+        """
+        for first in range(ids.start, ids.stop, self.chunk_size):
+            last = min(first + self.chunk_size, ids.stop)
+            known = set(
+                CrawlState.objects.filter(
+                    external_id__gte=first,
+                    external_id__lt=last,
+                    status__in=[Status.DONE, Status.NOT_FOUND],
+                ).values_list("external_id", flat=True)
+            )
+            yield from (i for i in range(first, last) if i not in known)
+
+    def pending(self, retry_failed: bool = True, stop: int = None) -> Iterator[int]:
+        """
+        Yield ids below ``stop`` still to be crawled, in ascending order.
+
+        Rows are read in keyset-paginated chunks, so ids marked while iterating
+        do not shift the pages.
+        """
+        if stop is None:
+            stop = self.last_id() + 1
+
+        statuses = [Status.PENDING]
+        if retry_failed:
+            statuses.append(Status.FAILED)
+
+        rows = CrawlState.objects.filter(
+            status__in=statuses,
+            attempts__lt=self.max_attempts,
+            external_id__lt=stop,
+        ).values_list("external_id", flat=True)
+        for chunk in keyset_chunks(rows, "external_id", self.chunk_size):
+            yield from chunk
+
+    def mark(self, ids: Iterable[int], status: str):
+        """
+        Record the crawl result of the given ids, creating missing rows.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+
+        CrawlState.objects.bulk_create(
+            [CrawlState(external_id=external_id) for external_id in ids],
+            ignore_conflicts=True,
+        )
+        CrawlState.objects.filter(external_id__in=ids).update(
+            status=status, attempts=F("attempts") + 1, updated_at=timezone.now()
+        )
+
+    def counts(self) -> dict[str, int]:
+        return {
+            row["status"]: row["count"]
+            for row in CrawlState.objects.values("status").annotate(count=Count("id"))
+        }
+
+
+frontier = CrawlFrontier()
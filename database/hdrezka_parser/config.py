@@ -0,0 +1,62 @@
+import json
+import os
+import threading
+
+from fake_useragent import UserAgent
+
+
+class UserAgentProvider:
+    """
+    Process-wide source of random User-Agent strings.
+
+    ``fake_useragent.UserAgent`` loads its whole browser database on creation,
+    so it is built once, on first use, and shared by all threads.
+    """
+
+    def __init__(self):
+        self._user_agent = None
+        self._lock = threading.Lock()
+
+    @property
+    def user_agent(self) -> UserAgent:
+        if self._user_agent is None:
+            with self._lock:
+                if self._user_agent is None:
+                    self._user_agent = UserAgent()
+        return self._user_agent
+
+    @property
+    def random(self) -> str:
+        return self.user_agent.random
+
+
+class ConfigLoader:
+    """
+    Cached reader of a JSON config file.
+
+    The file is parsed again only when its modification time changes. The returned
+    data is shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    with open(self.path, "rb") as file:
+                        self._data = json.load(fp=file)
+                    self._mtime = mtime
+        return self._data
+
+    def __getitem__(self, item: str):
+        return self.load()[item]
+
+
+user_agents = UserAgentProvider()
+request_config = ConfigLoader("requests_data.json")
@@ -0,0 +1,73 @@
+import threading
+from time import monotonic, sleep
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens are refilled continuously at ``rate`` tokens per second up to ``burst``.
+    ``acquire`` blocks the calling thread until a token is available.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("Rate must be a positive number.")
+
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            sleep(wait)
+
+
+class HostRateLimiter:
+    """
+    Keeps one TokenBucket per host, so every request to the same site shares the limit
+    no matter how many workers are sending them.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float = None, burst: int = None):
+        """
+        Change the limit for all hosts. Existing buckets are dropped and recreated lazily.
+        """
+        with self._lock:
+            self.rate = rate or self.rate
+            self.burst = burst or self.burst
+            self._buckets.clear()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url: str):
+        self.bucket(url).acquire()
+
+
+# Shared by every request sent through hdrezka_parser.request
+rate_limiter = HostRateLimiter()
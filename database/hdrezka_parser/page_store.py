@@ -0,0 +1,218 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def compress(content: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(content)
+    return gzip.compress(content, compresslevel=6)
+
+
+def decompress(body: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Pages compressed with zstd need the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return gzip.decompress(body)
+
+
+@dataclass
+class StoredPage:
+    url: str
+    fetched_at: float
+    headers: dict
+    codec: str
+    body: bytes
+
+    @property
+    def content(self) -> bytes:
+        return decompress(self.body, self.codec)
+
+
+class PageStore:
+    """
+    Keeps the HTML of fetched pages compressed in a SQLite file, keyed by URL
+    and fetch time, so pages can be parsed again without sending any request.
+
+    Every successful GET sent through hdrezka_parser.request is saved while the
+    store is enabled: with ``configure(path)`` or the PAGE_STORE environment
+    variable, which also reaches the processes of a sharded crawl.
+    Pages are compressed with zstd when the zstandard package is installed,
+    with gzip otherwise. Both are read back whatever the current codec is.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            headers TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            body BLOB NOT NULL,
+            PRIMARY KEY (url, fetched_at)
+        )
+    """
+
+    def __init__(self, path: str | Path = None):
+        self.path = None
+        self.codec = "zstd" if zstandard is not None else "gzip"
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if path:
+            self.configure(path)
+
+    def configure(self, path: str | Path = None, codec: str = None):
+        """
+        Store pages in the given file, or stop storing them with no path.
+        """
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package")
+
+        with self._lock:
+            self.close()
+            self.path = path and Path(path)
+            self.codec = codec or self.codec
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection is not reused by a forked process
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(self.SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def save(self, url: str, content: bytes, headers: dict = None):
+        # Compressed outside the lock, fetch threads only wait for the insert
+        row = (
+            url,
+            time.time(),
+            json.dumps(dict(headers or {})),
+            self.codec,
+            len(content),
+            compress(content, self.codec),
+        )
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", row
+            )
+
+    @staticmethod
+    def _page(row: tuple) -> StoredPage:
+        url, fetched_at, headers, codec, body = row
+        return StoredPage(url, fetched_at, json.loads(headers), codec, body)
+
+    def latest(self, url: str) -> StoredPage | None:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT url, fetched_at, headers, codec, body FROM pages "
+                    "WHERE url = ? ORDER BY fetched_at DESC LIMIT 1",
+                    [url],
+                )
+                .fetchone()
+            )
+        return row and self._page(row)
+
+    def pages(
+        self, urls: Iterable[str] = None, chunk_size: int = 500
+    ) -> Iterator[StoredPage]:
+        """
+        Yield the latest version of every stored page (of the given urls),
+        read in chunks ordered by URL.
+        """
+        if urls is not None:
+            urls = sorted(set(urls))
+            for i in range(0, len(urls), chunk_size):
+                chunk = urls[i : i + chunk_size]
+                yield from self._latest_of(
+                    f"url IN ({', '.join('?' * len(chunk))})", chunk
+                )
+            return
+
+        last = ""
+        while True:
+            chunk = list(self._latest_of("url > ?", [last], chunk_size))
+            if not chunk:
+                return
+            yield from chunk
+            last = chunk[-1].url
+
+    def _latest_of(self, where: str, params: list, limit: int = -1) -> list:
+        # SQLite returns the other columns from the row holding the max()
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT url, max(fetched_at), headers, codec, body FROM pages "
+                    f"WHERE {where} GROUP BY url ORDER BY url LIMIT ?",
+                    [*params, limit],
+                )
+                .fetchall()
+            )
+        return [self._page(row) for row in rows]
+
+    def prune(self, keep: int = 1) -> int:
+        """
+        Keep only the ``keep`` latest versions of every page.
+        Return the number of deleted versions.
+        """
+        with self._lock:
+            return (
+                self._connect()
+                .execute(
+                    "DELETE FROM pages WHERE rowid IN (SELECT rowid FROM ("
+                    "  SELECT rowid, row_number() OVER ("
+                    "    PARTITION BY url ORDER BY fetched_at DESC) AS version"
+                    "  FROM pages) WHERE version > ?)",
+                    [keep],
+                )
+                .rowcount
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            versions, pages, size, stored = (
+                self._connect()
+                .execute(
+                    "SELECT count(*), count(DISTINCT url), "
+                    "coalesce(sum(size), 0), coalesce(sum(length(body)), 0) FROM pages"
+                )
+                .fetchone()
+            )
+        return {
+            "pages": pages,
+            "versions": versions,
+            "size": size,
+            "stored_size": stored,
+            "ratio": round(size / stored, 2) if stored else 0,
+        }
+
+
+# Shared by every request sent through hdrezka_parser.request
+page_store = PageStore(os.environ.get("PAGE_STORE"))
@@ -1,19 +1,65 @@
+import re
 from datetime import datetime
 from abc import abstractmethod
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 
 from hdrezka_parser.request import get_request_config, get_trailer_url, get_soup
 
 
+class InfoTable:
+    """
+    Index of the film info table rows by their label, e.g. "Страна" or "Возраст".
+
+    The table is walked once, instead of searching the whole table again
+    for every field.
+    """
+
+    def __init__(self, table: Tag):
+        self._rows = {}
+        for row in table.find_all("tr"):
+            label = row.td and row.td.h2
+            if label is None:
+                continue
+            self._rows.setdefault(label.get_text(strip=True), row)
+
+    def row(self, label: str) -> Tag | None:
+        return self._rows.get(label)
+
+    def value(self, label: str) -> Tag | None:
+        """
+        Return the cell next to the label cell.
+        """
+        row = self.row(label)
+        return row and row.td.find_next_sibling("td")
+
+
 class Page:
     BASE_URL = ""
 
-    def __init__(self, id_):
+    def __init__(self, id_, page: BeautifulSoup = None):
         self.id = id_
         self._url = self.BASE_URL.format(self.id)
         self._headers = get_request_config()["headers"]
-        self.page = get_soup(url=self._url, headers=self._headers)
+        if page is None:
+            page = get_soup(url=self._url, headers=self._headers)
+        self.page = page
+
+    @classmethod
+    def from_html(cls, id_, html: str | bytes, parser: str = "lxml"):
+        """
+        Build a page from already downloaded HTML without sending any request.
+        """
+        return cls(id_, page=BeautifulSoup(html, parser))
+
+    @classmethod
+    def id_from_url(cls, url: str) -> int | None:
+        """
+        Return the id of a page of this type from its URL, or None for other URLs.
+        """
+        pattern = re.escape(cls.BASE_URL).replace(r"\{\}", r"(\d+)")
+        match = re.fullmatch(pattern, url)
+        return match and int(match.group(1))
 
     @abstractmethod
     def parse_page(self) -> dict:
@@ -49,12 +95,16 @@ class Movie(Page):
         except ValueError:
             return None
 
-    def parse_page(self):
+    def parse_page(self, with_trailer: bool = False):
+        """
+        Parse the film data. The trailer needs one more request, so it is only
+        resolved when ``with_trailer`` is set, otherwise "trailer" is None.
+        """
         table = self.page.select_one("table")
-        str_time = (
-            table.find(itemprop="duration")
-            and table.find(itemprop="duration").text.split()[0]
-        )
+        info = InfoTable(table)
+
+        duration_tag = table.find(itemprop="duration")
+        str_time = duration_tag and duration_tag.text.split()[0]
         try:
             duration = int(str_time)
         except ValueError:
@@ -69,47 +119,41 @@ class Movie(Page):
         except TypeError:
             duration = None
 
-        original_name = (
-            self.page.select_one(".b-post__origtitle")
-            and self.page.select_one(".b-post__origtitle").text
-        )
-        dubbing = table.find(string="В переводе") and table.find(
-            string="В переводе"
-        ).parent.parent.parent.td.find_next_sibling("td").text.replace(
-            " и ", ", "
-        ).split(
-            ", "
-        )
-        age = table.find(string="Возраст") and int(
-            table.find(string="Возраст")
-            .parent.parent.parent.td.find_next_sibling("td")
-            .span.text[:-1]
-        )
+        original_name = self.page.select_one(".b-post__origtitle")
+        original_name = original_name and original_name.text
+
+        dubbing = info.value("В переводе")
+        dubbing = dubbing and dubbing.text.replace(" и ", ", ").split(", ")
+
+        age = info.value("Возраст")
+        age = age and int(age.span.text[:-1])
+
+        description = self.page.select_one(".b-post__description_text")
         description = (
-            self.page.select_one(".b-post__description_text")
-            and self.page.select_one(".b-post__description_text").text
-            or table.find(string="Слоган")
-            .parent.parent.parent.select_one("td:last-child")
-            .text
+            description
+            and description.text
+            or info.row("Слоган").select_one("td:last-child").text
         )
 
+        country = info.row("Страна")
+        country = country and country.select_one("td > a").text
+
+        release = info.row("Дата выхода")
+        release = release and self.get_date_from_site(
+            release.select_one("td:last-child").text.replace("года", "")
+        )
+
+        rating = table.select_one(".imdb .bold")
+        rating = rating and float(rating.text)
+
         return {
             "name": self.page.select_one(".b-post__title > h1").text,
             "original_name": original_name,
             "description": description,
-            "country": table.find(string="Страна")
-            and table.find(string="Страна")
-            .parent.parent.parent.select_one("td > a")
-            .text,
-            "trailer": get_trailer_url(self.id),
-            "release": table.find(string="Дата выхода")
-            and self.get_date_from_site(
-                table.find(string="Дата выхода")
-                .parent.parent.parent.select_one("td:last-child")
-                .text.replace("года", "")
-            ),
-            "rating": table.select_one(".imdb .bold")
-            and float(table.select_one(".imdb .bold").text),
+            "country": country,
+            "trailer": get_trailer_url(self.id) if with_trailer else None,
+            "release": release,
+            "rating": rating,
             "genres": [genre.text for genre in table.find_all(itemprop="genre")],
             "actors": [
                 {
@@ -0,0 +1,103 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterator
+
+import requests
+
+
+class ReplayMissError(LookupError):
+    """
+    Raised in replay mode when the corpus has no recorded response for a request.
+    """
+
+
+class ResponseReplay:
+    """
+    Records responses to a local directory and serves them back without network access.
+
+    Every response is stored as two files named by a hash of the request:
+    ``<key>.json`` with the request and status and ``<key>.body`` with the raw content.
+
+    Modes:
+    - "off": requests go to the site as usual
+    - "record": requests go to the site and every response is saved
+    - "replay": responses are read from the directory, nothing is sent
+    """
+
+    MODES = ("off", "record", "replay")
+
+    def __init__(self, directory: str | Path = None, mode: str = "off"):
+        self.directory = None
+        self.mode = "off"
+        if directory is not None:
+            self.configure(directory, mode)
+
+    def configure(self, directory: str | Path = None, mode: str = "replay"):
+        if mode not in self.MODES:
+            raise ValueError(f"Invalid replay mode: {mode}")
+
+        self.directory = directory and Path(directory)
+        self.mode = mode if self.directory else "off"
+
+        if self.mode == "record":
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def key(method: str, url: str, data: dict = None) -> str:
+        data = json.dumps(data or {}, sort_keys=True, default=str)
+        return hashlib.sha1(f"{method.upper()} {url} {data}".encode()).hexdigest()
+
+    def save(self, method: str, url: str, data: dict, response: requests.Response):
+        key = self.key(method, url, data)
+        meta = {
+            "method": method.upper(),
+            "url": url,
+            "data": data,
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+        }
+        (self.directory / f"{key}.body").write_bytes(response.content)
+        with open(self.directory / f"{key}.json", "wt", encoding="utf-8") as file:
+            json.dump(meta, file, ensure_ascii=False, default=str)
+
+    def load(self, method: str, url: str, data: dict = None) -> requests.Response:
+        key = self.key(method, url, data)
+        meta_path = self.directory / f"{key}.json"
+        if not meta_path.exists():
+            raise ReplayMissError(f"No recorded response for {method.upper()} {url}")
+
+        with open(meta_path, "rt", encoding="utf-8") as file:
+            meta = json.load(file)
+
+        response = requests.Response()
+        response.status_code = meta["status_code"]
+        response.reason = meta.get("reason")
+        response.url = meta["url"]
+        response.headers.update(meta.get("headers") or {})
+        response._content = (self.directory / f"{key}.body").read_bytes()
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def entries(self) -> Iterator[dict]:
+        """
+        Metadata of every recorded response, sorted by file name.
+        """
+        for path in sorted(self.directory.glob("*.json")):
+            with open(path, "rt", encoding="utf-8") as file:
+                meta = json.load(file)
+            meta["body_path"] = path.with_suffix(".body")
+            yield meta
+
+
+# Shared by every request sent through hdrezka_parser.request
+response_replay = ResponseReplay()
@@ -1,64 +1,143 @@
-import json
-from time import sleep
-
 import colorama
-from colorama import Fore, Style
-
 import requests
-from fake_useragent import UserAgent
 from bs4 import BeautifulSoup
 
+from hdrezka_parser.config import request_config, user_agents
+from hdrezka_parser.limiter import rate_limiter
+from hdrezka_parser.page_store import page_store
+from hdrezka_parser.replay import response_replay
+from hdrezka_parser.retry import (
+    backoff,
+    circuit_breaker,
+    get_retry_after,
+    pause,
+)
+from hdrezka_parser.session import session_pool
+from metrics import fetch_errors_total, fetch_seconds, logger, responses_total
+
 
 def get_valid_page(func: callable):
+    """
+    Retry failed requests with exponential backoff and jitter (or the delay from
+    Retry-After). Results are reported to the shared circuit breaker, which pauses
+    every worker while the site keeps failing. A 404 is a valid answer and is
+    raised at once. Other exceptions (a replay miss, a parse error) say nothing
+    about the site, they are raised without being recorded, and a probe request
+    of the circuit breaker that ended this way is handed to the next worker.
+    """
+
     def wrapper(*args, **kwargs):
-        count = 0
-        while count < 10:
+        for attempt in range(backoff.max_attempts):
+            probe = circuit_breaker.wait()
+            recorded = False
             try:
-                return func(*args, **kwargs)
+                result = func(*args, **kwargs)
             except requests.exceptions.RequestException as e:
                 if (
                     isinstance(e, requests.exceptions.HTTPError)
                     and e.response.status_code == 404
                 ):
+                    circuit_breaker.record(success=True)
+                    recorded = True
                     raise
-                print(colorama.Fore.RED + "Connection error. Try to reconnect...")
-                print(str(e) + colorama.Style.RESET_ALL)
-                sleep(10)
-                count += 1
+                circuit_breaker.record(success=False)
+                recorded = True
+                fetch_errors_total.inc(error=type(e).__name__)
+                logger.warning(f"Connection error. Try to reconnect...\n{e}")
+                # Broken keep-alive sockets must not be reused by the next attempt
+                if isinstance(e, requests.exceptions.ConnectionError):
+                    session_pool.reset()
+                # No wait after the last attempt, the error is raised at once
+                if attempt < backoff.max_attempts - 1:
+                    pause(backoff.delay(attempt, get_retry_after(e.response)))
+            else:
+                circuit_breaker.record(success=True)
+                recorded = True
+                return result
+            finally:
+                if probe and not recorded:
+                    circuit_breaker.release_probe()
         raise Exception("Failed to establish connection after multiple attempts.")
 
     return wrapper
 
 
+def send_request(method: str, url: str, *args, **kwargs) -> requests.Response:
+    """
+    Send a request through the shared session pool under the host's rate limit.
+    In replay mode the recorded response is returned and nothing is sent.
+    Fetched pages are kept in the page store when it is enabled.
+    """
+    if response_replay.replaying:
+        return response_replay.load(method, url, kwargs.get("data"))
+
+    rate_limiter.acquire(url)
+    with fetch_seconds.time(method=method):
+        response = session_pool.request(method, url, *args, **kwargs)
+    responses_total.inc(status=response.status_code)
+
+    if response_replay.recording:
+        response_replay.save(method, url, kwargs.get("data"), response)
+
+    if page_store.enabled and method.upper() == "GET" and response.status_code == 200:
+        page_store.save(url, response.content, response.headers)
+
+    return response
+
+
+def _get_page(url: str, method: str = "GET", *args, **kwargs) -> requests.Response:
+    # Copy the headers, the ones from the request config are shared between requests
+    kwargs["headers"] = {
+        **(kwargs.get("headers") or {}),
+        "User-Agent": user_agents.random,
+    }
+
+    # Make a request to the URL and raise an error if the response code is not 200
+    response = send_request(method, url, *args, **kwargs)
+
+    response.raise_for_status()
+
+    logger.debug(f"{response.status_code} {url}", extra={"color": colorama.Fore.YELLOW})
+
+    return response
+
+
 # Define a function to retrieve the BeautifulSoup object for a given URL
 @get_valid_page
 def get_soup(
     url: str,
     method: str = "GET",
-    parser: str = "html.parser",
+    parser: str = "lxml",
     *args,
     **kwargs,
 ) -> BeautifulSoup:
+    response = _get_page(url, method, *args, **kwargs)
+    return BeautifulSoup(response.content, parser)
 
-    kwargs.setdefault("headers", {"User-Agent": None})[
-        "User-Agent"
-    ] = UserAgent().random
-
-    # Make a request to the URL and raise an error if the response code is not 200
-    response = requests.request(method, url, *args, **kwargs)
 
-    response.raise_for_status()
-
-    print(Fore.YELLOW + str(response.status_code) + Style.RESET_ALL)
+@get_valid_page
+def get_response(
+    url: str,
+    etag: str = None,
+    last_modified: str = None,
+    *args,
+    **kwargs,
+) -> requests.Response:
+    """
+    Conditional GET: with the validators of a previous response the site can answer
+    304 Not Modified without a body.
+    """
+    headers = dict(kwargs.pop("headers", None) or {})
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
 
-    return BeautifulSoup(response.content, parser)
+    return _get_page(url, "GET", *args, headers=headers, **kwargs)
 
 
 def get_request_config(request_type: str = "base") -> dict:
-    with open("requests_data.json", "rb") as file:
-        data = json.load(fp=file)
-
-    return data[request_type]
+    return request_config[request_type]
 
 
 @get_valid_page
@@ -70,7 +149,7 @@ def get_trailer_url(film_id: int):
         "id": film_id,
     }
 
-    response = requests.post(data=data, **trailer_data)
+    response = send_request("POST", data=data, **trailer_data)
 
     try:
         code = response.json()["code"]
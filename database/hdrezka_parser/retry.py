@@ -0,0 +1,198 @@
+import random
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep
+
+import requests
+
+from metrics import backoff_seconds_total, logger, retries_total
+
+
+class Backoff:
+    """
+    Exponential backoff with full jitter: the n-th retry waits a random time
+    between 0 and min(max_delay, base * factor ** n). A Retry-After sent by the
+    site takes precedence.
+    """
+
+    def __init__(
+        self,
+        base: float = 1.0,
+        factor: float = 2.0,
+        max_delay: float = 60.0,
+        max_attempts: int = 10,
+    ):
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base * self.factor**attempt))
+
+
+def get_retry_after(response: requests.Response | None) -> float | None:
+    """
+    Seconds to wait according to the Retry-After header (delay or HTTP date).
+    """
+    value = response is not None and response.headers.get("Retry-After")
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """
+    Shared by all workers: when too many of the last requests to the site failed,
+    every worker is paused for ``cooldown`` seconds. Then one probe request is let
+    through; its success closes the circuit, its failure pauses everyone again
+    with a doubled cooldown (up to ``max_cooldown``). A probe that ends without an
+    answer of the site is given to the next worker, and so is a probe that takes
+    longer than ``probe_timeout`` seconds.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(
+        self,
+        threshold: float = 0.5,
+        window: int = 20,
+        min_requests: int = 10,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        probe_timeout: float = 60.0,
+    ):
+        self.threshold = threshold
+        self.min_requests = min_requests
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.opened = 0
+        self.waited = 0.0
+        self._cooldown = cooldown
+        self._results = deque(maxlen=window)
+        self._open_until = 0.0
+        self._probe_started = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def error_rate(self) -> float:
+        if not self._results:
+            return 0.0
+        return self._results.count(False) / len(self._results)
+
+    def wait(self) -> bool:
+        """
+        Block while the circuit is open. Returns immediately when it is closed.
+        Return True when the caller sends the probe request: it must then settle
+        the circuit with ``record`` or ``release_probe``.
+        """
+        started = monotonic()
+        probe = False
+        with self._condition:
+            while self.state != self.CLOSED:
+                if self.state == self.OPEN:
+                    remaining = self._open_until - monotonic()
+                else:
+                    remaining = self._probe_started + self.probe_timeout - monotonic()
+                if remaining <= 0:
+                    # This worker sends the probe, the others keep waiting
+                    self.state = self.HALF_OPEN
+                    self._probe_started = monotonic()
+                    probe = True
+                    break
+                self._condition.wait(remaining)
+
+            self.waited += monotonic() - started
+        return probe
+
+    def release_probe(self):
+        """
+        The probe ended without an answer of the site, let the next worker send one.
+        """
+        with self._condition:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._condition.notify_all()
+
+    def record(self, success: bool):
+        with self._condition:
+            if self.state == self.HALF_OPEN:
+                if success:
+                    self._close()
+                else:
+                    self._open(self._cooldown * 2)
+                return
+
+            self._results.append(success)
+            if (
+                self.state == self.CLOSED
+                and len(self._results) >= self.min_requests
+                and self.error_rate >= self.threshold
+            ):
+                self._open(self._cooldown)
+
+    def _open(self, cooldown: float):
+        self._cooldown = min(cooldown, self.max_cooldown)
+        self._open_until = monotonic() + self._cooldown
+        self.state = self.OPEN
+        self.opened += 1
+        logger.warning(
+            f"Too many failed requests, all workers paused for {self._cooldown}s"
+        )
+        self._condition.notify_all()
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._cooldown = self.base_cooldown
+        self._results.clear()
+        self._condition.notify_all()
+
+
+class RetryStats:
+    """
+    Counters of retried requests and of the time spent waiting in backoff.
+    """
+
+    def __init__(self):
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, delay: float):
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += delay
+
+    def snapshot(self) -> dict:
+        return {
+            "retries": self.retries,
+            "backoff_seconds": round(self.backoff_seconds, 3),
+            "circuit_state": circuit_breaker.state,
+            "circuit_opened": circuit_breaker.opened,
+            "circuit_wait_seconds": round(circuit_breaker.waited, 3),
+        }
+
+
+def pause(delay: float):
+    retry_stats.add(delay)
+    retries_total.inc()
+    backoff_seconds_total.inc(delay)
+    sleep(delay)
+
+
+# Shared by every request sent through hdrezka_parser.request
+backoff = Backoff()
+circuit_breaker = CircuitBreaker()
+retry_stats = RetryStats()
@@ -0,0 +1,120 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """
+    Hands out one keep-alive ``requests.Session`` per thread.
+
+    ``requests.Session`` is not guaranteed to be thread-safe, so every worker thread
+    gets its own session, while connections inside a session are reused between
+    requests to the same host.
+    """
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 10):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._local = threading.local()
+        self._sessions = []
+        self._retired = {"connections": 0, "requests": 0}
+        self._lock = threading.Lock()
+
+    def configure(self, pool_connections: int = None, pool_maxsize: int = None):
+        """
+        Change pool sizes. Already opened sessions are closed and recreated lazily.
+        """
+        self.pool_connections = pool_connections or self.pool_connections
+        self.pool_maxsize = pool_maxsize or self.pool_maxsize
+        self.close()
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._create_session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def request(self, method: str, url: str, *args, **kwargs) -> requests.Response:
+        return self.session.request(method, url, *args, **kwargs)
+
+    def reset(self):
+        """
+        Drop the current thread's session, e.g. after a connection error left
+        broken sockets in its pool or when the thread exits. Its counters are kept
+        in the stats.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            return
+        self._local.session = None
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        self._retire(session)
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            self._retire(session)
+        self._local = threading.local()
+
+    @staticmethod
+    def _counters(session: requests.Session) -> tuple[int, int]:
+        connections = requests_count = 0
+        for adapter in set(session.adapters.values()):
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools[key]
+                connections += pool.num_connections
+                requests_count += pool.num_requests
+        return connections, requests_count
+
+    def _retire(self, session: requests.Session):
+        connections, requests_count = self._counters(session)
+        with self._lock:
+            self._retired["connections"] += connections
+            self._retired["requests"] += requests_count
+        session.close()
+
+    def stats(self) -> dict:
+        """
+        Connection-reuse counters summed over all sessions opened by the pool.
+
+        ``connections`` is the number of TCP (and TLS) handshakes made,
+        ``requests`` the number of requests sent over them.
+        """
+        with self._lock:
+            sessions = list(self._sessions)
+            connections = self._retired["connections"]
+            requests_count = self._retired["requests"]
+
+        for session in sessions:
+            session_connections, session_requests = self._counters(session)
+            connections += session_connections
+            requests_count += session_requests
+
+        return {
+            "sessions": len(sessions),
+            "connections": connections,
+            "requests": requests_count,
+            "reused": max(0, requests_count - connections),
+        }
+
+
+# Shared by every request sent through hdrezka_parser.request
+session_pool = SessionPool()
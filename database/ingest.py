@@ -0,0 +1,233 @@
+from django.db import transaction
+
+import init_django_orm  # noqa: F401
+
+from db import cache
+from db.models import Film, MovieMaker
+from search import index_films
+
+FILM_RELATIONS = ("genres", "actors", "directors", "dubbing")
+
+
+def prepare_movie_maker(movie_maker: dict) -> tuple[dict, list[str]]:
+    """
+    Normalize parsed moviemaker data.
+    Return the MovieMaker field values and the list of profession names.
+    """
+    movie_maker = dict(movie_maker)
+
+    # A film page gives a single profession, a maker page gives a list
+    professions = movie_maker.pop("profession", None) or []
+    if isinstance(professions, str):
+        professions = [professions]
+
+    # Map "актриса" to "актер" in the profession list
+    professions = [p if p != "актриса" else "актер" for p in professions]
+
+    # Fix birthdate format if needed
+    if movie_maker.get("birth_date"):
+        birth_date_parts = movie_maker["birth_date"].split("-")
+        for i in range(3):
+            if not int(birth_date_parts[i]):
+                birth_date_parts[i] = birth_date_parts[i].replace("0", "1", 1)
+        movie_maker["birth_date"] = "-".join(birth_date_parts)
+
+    movie_maker["external_id"] = int(movie_maker["external_id"])
+    return movie_maker, professions
+
+
+def add_maker_professions(professions: dict[int, list[str]]):
+    """
+    Link moviemakers to their professions with one bulk insert.
+    Links that already exist are kept, missing professions are created.
+
+    :param professions: moviemaker pk -> list of profession names.
+    """
+    profession_ids = cache.professions.get_or_create_many(
+        name for names in professions.values() for name in names
+    )
+    MovieMaker.profession.through.objects.bulk_create(
+        [
+            MovieMaker.profession.through(
+                moviemaker_id=maker_id, profession_id=profession_ids[name]
+            )
+            for maker_id, names in professions.items()
+            for name in set(names)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class MakerAccumulator:
+    """
+    Pending moviemakers of a batch keyed by external_id.
+
+    The same person can appear in many films of a batch and as both actor and
+    director. They are stored once, with all their professions merged.
+    """
+
+    def __init__(self):
+        self._makers = {}
+
+    def __len__(self):
+        return len(self._makers)
+
+    def __contains__(self, external_id):
+        return int(external_id) in self._makers
+
+    def add(self, maker: dict):
+        external_id = int(maker["external_id"])
+        professions = maker.get("profession") or []
+        if isinstance(professions, str):
+            professions = [professions]
+
+        pending = self._makers.get(external_id)
+        if pending is None:
+            self._makers[external_id] = {**maker, "profession": list(professions)}
+            return
+
+        pending["profession"] += [
+            p for p in professions if p not in pending["profession"]
+        ]
+
+    def extend(self, makers: list[dict]):
+        for maker in makers:
+            self.add(maker)
+
+    def drain(self) -> list[dict]:
+        """
+        Return all pending moviemakers and start a new batch.
+        """
+        makers = list(self._makers.values())
+        self._makers = {}
+        return makers
+
+
+class BulkFilmWriter:
+    """
+    Save batches of parsed films with a fixed number of queries per batch.
+
+    All genres, dubbings and moviemakers referenced by the batch are resolved with
+    set queries, missing ones are created with bulk_create, then the Film rows and
+    the rows of every many-to-many through table are bulk created.
+    Each batch is written in one transaction.
+    """
+
+    def write(self, films: list[dict]) -> list[Film]:
+        films = self._new_films(films)
+        if not films:
+            return []
+
+        with transaction.atomic():
+            genres = self.resolve_genres(films)
+            dubbings = self.resolve_dubbings(films)
+            makers = self.resolve_makers(films)
+
+            film_objs = Film.objects.bulk_create(
+                [
+                    Film(**{k: v for k, v in film.items() if k not in FILM_RELATIONS})
+                    for film in films
+                ]
+            )
+            film_ids = dict(
+                Film.objects.filter(
+                    external_id__in=[film["external_id"] for film in films]
+                ).values_list("external_id", "pk")
+            )
+
+            through_rows = {relation: [] for relation in FILM_RELATIONS}
+            for film in films:
+                film_id = film_ids[film["external_id"]]
+                through_rows["genres"] += [
+                    Film.genres.through(film_id=film_id, genre_id=genres[name])
+                    for name in set(film["genres"])
+                    if name in genres
+                ]
+                through_rows["dubbing"] += [
+                    Film.dubbing.through(film_id=film_id, dubbing_id=dubbings[name])
+                    for name in set(film["dubbing"])
+                ]
+                for relation in ("actors", "directors"):
+                    through = getattr(Film, relation).through
+                    through_rows[relation] += [
+                        through(film_id=film_id, moviemaker_id=makers[external_id])
+                        for external_id in {
+                            int(maker["external_id"]) for maker in film[relation]
+                        }
+                    ]
+
+            for relation, rows in through_rows.items():
+                getattr(Film, relation).through.objects.bulk_create(
+                    rows, ignore_conflicts=True
+                )
+            index_films(film_ids.values())
+
+        for film_obj in film_objs:
+            film_obj.pk = film_ids[film_obj.external_id]
+        return film_objs
+
+    @staticmethod
+    def _new_films(films: list[dict]) -> list[dict]:
+        """
+        Prepare parsed films for saving and drop the ones already in the database.
+        """
+        prepared = {}
+        for film in films:
+            film = dict(film)
+            film["external_id"] = int(film["external_id"])
+            # Split release date string to get only the date and NULL if it NULL
+            film["release"] = film.get("release") and film["release"].split()[0]
+            film["genres"] = film.get("genres") or []
+            film["dubbing"] = film.get("dubbing") or []
+            film["actors"] = film.get("actors") or []
+            film["directors"] = film.get("directors") or []
+            prepared[film["external_id"]] = film
+
+        existing = set(
+            Film.objects.filter(external_id__in=prepared).values_list(
+                "external_id", flat=True
+            )
+        )
+        return [
+            film
+            for external_id, film in prepared.items()
+            if external_id not in existing
+        ]
+
+    @staticmethod
+    def resolve_genres(films: list[dict]) -> dict[str, int]:
+        """
+        Only genres that already exist are linked, as add_film does.
+        """
+        return cache.genres.get_many(name for film in films for name in film["genres"])
+
+    @staticmethod
+    def resolve_dubbings(films: list[dict]) -> dict[str, int]:
+        return cache.dubbings.get_or_create_many(
+            name for film in films for name in film["dubbing"]
+        )
+
+    @staticmethod
+    def resolve_makers(films: list[dict]) -> dict[int, int]:
+        makers = {}
+        for film in films:
+            for maker in film["actors"] + film["directors"]:
+                makers.setdefault(int(maker["external_id"]), maker)
+
+        prepared = {
+            external_id: prepare_movie_maker(maker)
+            for external_id, maker in makers.items()
+        }
+        maker_ids = cache.movie_makers.get_or_create_many(
+            makers,
+            defaults={
+                external_id: fields for external_id, (fields, _) in prepared.items()
+            },
+        )
+        add_maker_professions(
+            {
+                maker_ids[external_id]: professions
+                for external_id, (_, professions) in prepared.items()
+            }
+        )
+        return maker_ids
@@ -0,0 +1,305 @@
+"""
+Metrics and logging shared by the crawler, the ingest pipeline and the bot.
+
+Metrics are kept in memory: counters, gauges and histograms, optionally split by
+labels. ``registry.exposition()`` renders them in the Prometheus text format and
+``serve(port)`` exposes it on ``/metrics``.
+
+Log records are put on a queue and written to stdout by a background thread,
+so logging never blocks a worker on the console.
+"""
+
+import atexit
+import bisect
+import logging
+import os
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import QueueHandler, QueueListener
+from time import perf_counter
+
+import colorama
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _format_labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        escaped = (
+            (name, value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+            for name, value in pairs
+        )
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{self._format_labels(key)} {value}"
+            for key, value in sorted(values.items())
+        ]
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: tuple[str] = (),
+        buckets: tuple[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Counts per bucket, sum and number of observations
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started, **labels)
+
+    def value(self, **labels) -> tuple[float, int]:
+        """
+        Sum and number of observations.
+        """
+        series = self._values.get(self._key(labels))
+        return (series[1], series[2]) if series else (0.0, 0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            }
+
+        lines = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = self._format_labels(key, {"le": repr(float(bound))})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = self._format_labels(key, {"le": "+Inf"})
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: tuple[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: tuple[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: tuple[str] = (),
+        buckets: tuple[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def exposition(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines += metric.samples()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.exposition().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int = 9100, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Expose the metrics on http://host:port/metrics from a background thread.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class ColorFormatter(logging.Formatter):
+    """
+    Console output as before: a record can carry its own colorama color,
+    warnings and errors are red.
+    """
+
+    LEVEL_COLORS = {
+        logging.WARNING: colorama.Fore.RED,
+        logging.ERROR: colorama.Fore.RED,
+        logging.CRITICAL: colorama.Fore.RED,
+    }
+
+    def format(self, record: logging.LogRecord) -> str:
+        color = getattr(record, "color", None) or self.LEVEL_COLORS.get(
+            record.levelno, ""
+        )
+        message = super().format(record)
+        return color + message + colorama.Style.RESET_ALL if color else message
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_logger(name: str = "filmbot") -> logging.Logger:
+    """
+    Logger writing through a queue, the console is written by a background thread.
+    The level is taken from the LOG_LEVEL environment variable (INFO by default).
+    """
+    global _listener
+
+    root = logging.getLogger("filmbot")
+    with _listener_lock:
+        if _listener is None:
+            records = queue.SimpleQueue()
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(ColorFormatter("%(message)s"))
+            _listener = QueueListener(records, console)
+            _listener.start()
+            atexit.register(_listener.stop)
+
+            root.addHandler(QueueHandler(records))
+            root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+            root.propagate = False
+
+    return root if name == "filmbot" else root.getChild(name)
+
+
+logger = get_logger()
+
+
+# Metrics of the crawl and ingest path
+fetch_seconds = registry.histogram(
+    "filmbot_fetch_seconds", "Time to receive a response from the site", ("method",)
+)
+responses_total = registry.counter(
+    "filmbot_responses_total", "Responses received from the site", ("status",)
+)
+fetch_errors_total = registry.counter(
+    "filmbot_fetch_errors_total", "Failed requests to the site", ("error",)
+)
+retries_total = registry.counter("filmbot_retries_total", "Retried requests")
+backoff_seconds_total = registry.counter(
+    "filmbot_backoff_seconds_total", "Time spent waiting before retries"
+)
+parse_seconds = registry.histogram(
+    "filmbot_parse_seconds", "Time to parse a downloaded page", ("page",)
+)
+db_write_seconds = registry.histogram(
+    "filmbot_db_write_seconds", "Time to write a batch to the database", ("operation",)
+)
+pages_total = registry.counter(
+    "filmbot_pages_total", "Crawled pages by result", ("result",)
+)
+stage_items_total = registry.counter(
+    "filmbot_stage_items_total", "Items processed by pipeline stages", ("stage",)
+)
+stage_errors_total = registry.counter(
+    "filmbot_stage_errors_total", "Exceptions raised by pipeline stages", ("stage",)
+)
+queue_depth = registry.gauge(
+    "filmbot_queue_depth", "Items waiting in front of a pipeline stage", ("stage",)
+)
+task_seconds = registry.histogram(
+    "filmbot_task_seconds",
+    "Duration of timed tasks",
+    ("task",),
+    buckets=(1, 10, 60, 300, 900, 3600, 4 * 3600, 12 * 3600),
+)
+events_total = registry.counter(
+    "filmbot_events_total", "Items reported by print_info", ("event",)
+)
@@ -0,0 +1,113 @@
+"""
+Completion and failure notifications of long running tasks.
+
+A backend delivers a notification: ``NoopNotifier`` drops it, ``LogNotifier``
+writes it to the log and ``TelegramNotifier`` sends it to a Telegram chat.
+``notifier`` hands notifications to its backend from a background thread, so a
+slow or unreachable backend never holds up the task that finished.
+
+The backend is chosen with the NOTIFY_BACKEND environment variable
+(``none``, ``log`` or ``telegram``, ``log`` by default) or in code:
+    notifier.backend = TelegramNotifier(token, chat_id)
+"""
+
+import atexit
+import os
+import queue
+import threading
+from abc import ABC, abstractmethod
+
+import colorama
+import telebot
+
+from metrics import logger
+
+SUCCESS = "success"
+FAILURE = "failure"
+
+
+class Notifier(ABC):
+    @abstractmethod
+    def send(self, event: str, message: str):
+        pass
+
+
+class NoopNotifier(Notifier):
+    def send(self, event: str, message: str):
+        pass
+
+
+class LogNotifier(Notifier):
+    def send(self, event: str, message: str):
+        if event == FAILURE:
+            logger.error(message)
+        else:
+            logger.info(message, extra={"color": colorama.Fore.GREEN})
+
+
+class TelegramNotifier(Notifier):
+    ICONS = {SUCCESS: "✅", FAILURE: "❌"}
+
+    def __init__(self, token: str, chat_id: int | str, timeout: float = 10):
+        self.bot = telebot.TeleBot(token, threaded=False)
+        self.chat_id = chat_id
+        self.timeout = timeout
+
+    def send(self, event: str, message: str):
+        self.bot.send_message(
+            self.chat_id, f"{self.ICONS.get(event, '')} {message}", timeout=self.timeout
+        )
+
+
+def backend_from_env() -> Notifier:
+    name = os.environ.get("NOTIFY_BACKEND", "log").lower()
+    if name == "none":
+        return NoopNotifier()
+    if name == "log":
+        return LogNotifier()
+    if name == "telegram":
+        return TelegramNotifier(
+            os.environ["TELEGRAM_TOKEN"], os.environ["TELEGRAM_CHAT_ID"]
+        )
+    raise ValueError(f"Unknown NOTIFY_BACKEND: {name}")
+
+
+class AsyncNotifier:
+    """
+    Queue notifications and deliver them from a daemon thread, started on first use.
+    Notifications still queued at exit are delivered for up to ``exit_timeout`` seconds.
+    """
+
+    def __init__(self, backend: Notifier, exit_timeout: float = 10):
+        self.backend = backend
+        self.exit_timeout = exit_timeout
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def notify(self, event: str, message: str):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="notifier", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+        self._queue.put((event, message))
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(self.exit_timeout)
+
+    def _run(self):
+        while (item := self._queue.get()) is not None:
+            try:
+                self.backend.send(*item)
+            except Exception as error:
+                logger.warning(f"Notification was not sent: {error!r}")
+
+
+notifier = AsyncNotifier(backend_from_env())
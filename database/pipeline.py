@@ -0,0 +1,193 @@
+import queue
+import threading
+from time import monotonic
+from typing import Any, Callable, Iterable
+
+import colorama
+from django.db import connection
+
+from hdrezka_parser.session import session_pool
+from metrics import logger, queue_depth, stage_errors_total, stage_items_total
+
+STOP = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline: a pool of worker threads reading from a bounded queue.
+
+    ``func`` is called with every item and its result is passed to the next stage.
+    None results are still passed on as placeholders, so an ordered stage further
+    down can keep track of the sequence, but ``func`` is never called with None.
+
+    :param ordered: deliver items to ``func`` in the order they entered the pipeline.
+        Requires a single worker.
+    :param flush: called once after all items went through the stage;
+        its result (if not None) is sent to the next stage, e.g. a partial batch.
+    :param skip_on_stop: drop items instead of processing them once the pipeline
+        is stopping, e.g. do not fetch more pages after a fatal error.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        workers: int = 1,
+        maxsize: int = 100,
+        ordered: bool = False,
+        flush: Callable[[], Any] = None,
+        skip_on_stop: bool = False,
+    ):
+        if ordered and workers != 1:
+            raise ValueError("An ordered stage must have exactly one worker.")
+
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.ordered = ordered
+        self.flush = flush
+        self.skip_on_stop = skip_on_stop
+        self.processed = 0
+        self._lock = threading.Lock()
+
+
+class Pipeline:
+    """
+    Run items through a chain of stages connected by bounded queues.
+
+    A full queue blocks the stage in front of it, so a slow stage (e.g. the database
+    writer) slows down fetching instead of piling items up in memory.
+    After the input is exhausted every stage is drained and flushed in order.
+    The first exception raised by any stage stops feeding new items
+    and is raised again from ``run`` once everything in flight is flushed.
+    """
+
+    def __init__(self, stages: list[Stage], report_every: float = 30):
+        self.stages = stages
+        self.report_every = report_every
+        self.errors = []
+        self._stopping = threading.Event()
+        self._started = None
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def stop(self):
+        """
+        Stop feeding new items. Items already in the pipeline are still flushed.
+        """
+        self._stopping.set()
+
+    def depths(self) -> dict[str, int]:
+        return {stage.name: stage.queue.qsize() for stage in self.stages}
+
+    def report(self):
+        elapsed = monotonic() - self._started
+        first = self.stages[0]
+        depths = self.depths()
+        for name, depth in depths.items():
+            queue_depth.set(depth, stage=name)
+        logger.info(
+            f"{first.processed} items, {first.processed / elapsed:.2f} items/sec, "
+            + "queues: "
+            + ", ".join(f"{name}: {depth}" for name, depth in depths.items()),
+            extra={"color": colorama.Fore.MAGENTA},
+        )
+
+    def _send(self, index: int, seq: int, item):
+        if index < len(self.stages):
+            self.stages[index].queue.put((seq, item))
+
+    def _process(self, stage: Stage, item):
+        if item is None or (stage.skip_on_stop and self.stopping):
+            return None
+        try:
+            return stage.func(item)
+        except Exception as e:
+            stage_errors_total.inc(stage=stage.name)
+            self.errors.append(e)
+            self.stop()
+            return None
+        finally:
+            stage_items_total.inc(stage=stage.name)
+            with stage._lock:
+                stage.processed += 1
+
+    def _worker(self, index: int, stage: Stage):
+        pending = {}
+        next_seq = 0
+
+        try:
+            while True:
+                message = stage.queue.get()
+                if message is STOP:
+                    return
+
+                seq, item = message
+                if not stage.ordered:
+                    self._send(index + 1, seq, self._process(stage, item))
+                    continue
+
+                pending[seq] = item
+                while next_seq in pending:
+                    result = self._process(stage, pending.pop(next_seq))
+                    self._send(index + 1, next_seq, result)
+                    next_seq += 1
+        finally:
+            # Every thread gets its own database connection and HTTP session,
+            # close them with the thread
+            connection.close()
+            session_pool.reset()
+
+    def _reporter(self, done: threading.Event):
+        while not done.wait(self.report_every):
+            self.report()
+
+    def run(self, items: Iterable):
+        self._started = monotonic()
+        self._stopping.clear()
+        self.errors = []
+
+        workers = []
+        for index, stage in enumerate(self.stages):
+            stage.processed = 0
+            threads = [
+                threading.Thread(target=self._worker, args=(index, stage), daemon=True)
+                for _ in range(stage.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            workers.append(threads)
+
+        done = threading.Event()
+        threading.Thread(target=self._reporter, args=(done,), daemon=True).start()
+
+        seq = 0
+        try:
+            for item in items:
+                if self.stopping:
+                    break
+                self._send(0, seq, item)
+                seq += 1
+        finally:
+            # Drain the stages one after another and flush partial batches
+            for index, stage in enumerate(self.stages):
+                for _ in workers[index]:
+                    stage.queue.put(STOP)
+                for thread in workers[index]:
+                    thread.join()
+
+                if stage.flush is not None:
+                    try:
+                        self._send(index + 1, seq, stage.flush())
+                    except Exception as e:
+                        self.errors.append(e)
+                    seq += 1
+
+            done.set()
+            self.report()
+
+        if self.errors:
+            raise self.errors[0]
@@ -0,0 +1,210 @@
+import hashlib
+import json
+from typing import Iterator
+
+import colorama
+import requests
+from bs4 import BeautifulSoup
+from django.db import transaction
+
+import init_django_orm  # noqa: F401
+
+from db import cache
+from db.models import CrawlState, Film
+from db.queries import keyset_chunks
+from hdrezka_parser.limiter import rate_limiter
+from hdrezka_parser.parser import Movie
+from hdrezka_parser.request import get_request_config, get_response
+from metrics import db_write_seconds, logger, parse_seconds
+from pipeline import Pipeline, Stage
+from scripts import get_movie_maker_ids
+from search import index_films
+from utils import Timer
+
+NOT_MODIFIED = 304
+
+# Fields that are not compared on refresh: the trailer is resolved separately
+SKIPPED_FIELDS = ("external_id", "trailer")
+
+
+def content_hash(movie: dict) -> str:
+    """
+    Stable hash of the parsed film data, used to skip writes for unchanged pages.
+    """
+    data = {k: v for k, v in movie.items() if k not in SKIPPED_FIELDS}
+    dump = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(dump.encode()).hexdigest()
+
+
+def films_to_refresh(ids: list[int] = None, chunk_size: int = 1000) -> Iterator[dict]:
+    """
+    Yield saved films with the validators stored for them, keyset-paginated.
+    """
+    films = Film.objects.all()
+    if ids is not None:
+        films = films.filter(external_id__in=ids)
+
+    films = films.values_list("external_id", flat=True)
+    for chunk in keyset_chunks(films, "external_id", chunk_size):
+        states = {
+            state["external_id"]: state
+            for state in CrawlState.objects.filter(external_id__in=chunk).values(
+                "external_id", "etag", "last_modified", "content_hash"
+            )
+        }
+        for external_id in chunk:
+            yield states.get(external_id) or {"external_id": external_id}
+
+
+def fetch_film(state: dict) -> tuple[dict, requests.Response | Exception]:
+    url = Movie.BASE_URL.format(state["external_id"])
+    try:
+        response = get_response(
+            url,
+            etag=state.get("etag"),
+            last_modified=state.get("last_modified"),
+            headers=get_request_config()["headers"],
+        )
+    except requests.exceptions.HTTPError as e:
+        return state, e
+    return state, response
+
+
+def parse_film(fetched: tuple[dict, requests.Response | Exception]) -> dict | None:
+    """
+    Parse a changed page. Return None when there is nothing to write.
+    """
+    state, response = fetched
+    if isinstance(response, Exception):
+        logger.error(str(response))
+        return None
+    if response.status_code == NOT_MODIFIED:
+        return None
+
+    external_id = state["external_id"]
+    try:
+        movie = Movie(external_id, page=BeautifulSoup(response.content, "lxml"))
+        with parse_seconds.time(page="movie"):
+            movie = movie.parse_page()
+    except AttributeError:
+        logger.warning(f"bad parser #{external_id}")
+        return None
+
+    validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": content_hash(movie),
+    }
+    if validators["content_hash"] == state.get("content_hash"):
+        if all(state.get(key) == value for key, value in validators.items()):
+            return None
+        # Only the validators changed, the film itself did not
+        movie = None
+
+    return {"external_id": external_id, "movie": movie, "validators": validators}
+
+
+def film_diff(film: Film, movie: dict) -> dict:
+    """
+    Return the scalar fields whose parsed value differs from the saved one.
+    """
+    movie = dict(movie)
+    movie["release"] = movie.get("release") and movie["release"].split()[0]
+    parsed = Film(
+        **{
+            field.name: movie[field.name]
+            for field in Film._meta.concrete_fields
+            if field.name in movie and field.name not in SKIPPED_FIELDS
+        }
+    )
+
+    changed = {}
+    for field in Film._meta.concrete_fields:
+        if field.name not in movie or field.name in SKIPPED_FIELDS:
+            continue
+        old = field.get_prep_value(field.value_from_object(film))
+        new = field.get_prep_value(field.value_from_object(parsed))
+        if old != new:
+            changed[field.name] = new
+    return changed
+
+
+def relation_ids(movie: dict) -> dict[str, set[int]]:
+    return {
+        "genres": set(cache.genres.get_many(movie["genres"] or []).values()),
+        "actors": set(get_movie_maker_ids(movie["actors"] or []).values()),
+        "directors": set(get_movie_maker_ids(movie["directors"] or []).values()),
+        "dubbing": set(
+            cache.dubbings.get_or_create_many(movie["dubbing"] or []).values()
+        ),
+    }
+
+
+def write_film(result: dict) -> int:
+    """
+    Update only what differs and store the new validators.
+    Return the number of changed fields and relations.
+    """
+    external_id = result["external_id"]
+    movie = result["movie"]
+    changes = 0
+
+    with db_write_seconds.time(operation="refresh"), transaction.atomic():
+        if movie is not None:
+            film = Film.objects.get(external_id=external_id)
+
+            changed = film_diff(film, movie)
+            if changed:
+                Film.objects.filter(pk=film.pk).update(**changed)
+                changes += len(changed)
+
+            for relation, new_ids in relation_ids(movie).items():
+                manager = getattr(film, relation)
+                old_ids = set(manager.values_list("pk", flat=True))
+                if new_ids != old_ids:
+                    manager.remove(*(old_ids - new_ids))
+                    manager.add(*(new_ids - old_ids))
+                    changes += 1
+
+            if changes:
+                index_films([film.pk])
+
+        CrawlState.objects.update_or_create(
+            external_id=external_id,
+            defaults={**result["validators"], "status": CrawlState.Status.DONE},
+        )
+
+    if changes:
+        logger.info(
+            f"Film #{external_id}: {changes} changes saved",
+            extra={"color": colorama.Fore.CYAN},
+        )
+    return changes
+
+
+@Timer()
+def refresh_films(
+    ids: list[int] = None,
+    workers: int = 1,
+    rate: float = 1.0,
+    parse_workers: int = 1,
+    queue_size: int = 100,
+):
+    """
+    Refresh saved films incrementally.
+
+    Pages are requested with the ETag/Last-Modified of the previous response.
+    Unmodified pages (304) are not parsed, pages whose parsed content hash did not
+    change are not written, and for the rest only differing fields and relation
+    rows are updated. The trailer is not requested again.
+    """
+    rate_limiter.configure(rate=rate)
+
+    pipeline = Pipeline(
+        [
+            Stage("fetch", fetch_film, workers, queue_size, skip_on_stop=True),
+            Stage("parse", parse_film, parse_workers, queue_size),
+            Stage("write", write_film, 1, queue_size),
+        ]
+    )
+    pipeline.run(films_to_refresh(ids))
@@ -0,0 +1,155 @@
+import argparse
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+
+import colorama
+
+import init_django_orm  # noqa: F401
+
+from db.models import CrawlState, Film
+from db.queries import chunked
+from hdrezka_parser.page_store import PageStore, StoredPage, page_store
+from hdrezka_parser.parser import Movie
+from metrics import logger, parse_seconds
+from refresh import content_hash, write_film
+from scripts import write_batch
+from similar import update_similar
+from utils import Timer
+
+
+def parse_stored(pages: list[StoredPage]) -> list[tuple[int, dict, dict | Exception]]:
+    """
+    Parse stored movie pages. Runs in the worker processes of reparse_from_cache,
+    unexpected markup is returned instead of raised.
+    """
+    results = []
+    for page in pages:
+        external_id = Movie.id_from_url(page.url)
+        try:
+            with parse_seconds.time(page="movie"):
+                movie = Movie.from_html(external_id, page.content).parse_page()
+        except AttributeError as e:
+            movie = e
+        results.append((external_id, page.headers, movie))
+    return results
+
+
+def write_parsed(
+    results: list[tuple[int, dict, dict | Exception]],
+) -> tuple[dict[str, int], list[int]]:
+    """
+    Save new films in one batch, update only what changed in the saved ones.
+    Return the number of pages by outcome and the pks of the new films.
+    """
+    ids = [external_id for external_id, _, _ in results]
+    saved = set(
+        Film.objects.filter(external_id__in=ids).values_list("external_id", flat=True)
+    )
+    hashes = dict(
+        CrawlState.objects.filter(external_id__in=ids).values_list(
+            "external_id", "content_hash"
+        )
+    )
+
+    counts = {"new": 0, "changed": 0, "unchanged": 0, "failed": 0}
+    new_films = []
+    for external_id, headers, movie in results:
+        if isinstance(movie, Exception):
+            logger.warning(f"bad parser #{external_id}")
+            counts["failed"] += 1
+            continue
+        if external_id not in saved:
+            new_films.append(movie)
+            continue
+
+        validators = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_hash": content_hash(movie),
+        }
+        if validators["content_hash"] == hashes.get(external_id):
+            counts["unchanged"] += 1
+            continue
+        changes = write_film(
+            {"external_id": external_id, "movie": movie, "validators": validators}
+        )
+        counts["changed" if changes else "unchanged"] += 1
+
+    new_ids = []
+    if new_films:
+        new_ids = write_batch({"films": new_films, "missing": {}})
+        counts["new"] += len(new_films)
+    return counts, new_ids
+
+
+@Timer()
+def reparse_from_cache(
+    ids: list[int] = None,
+    processes: int = None,
+    chunk_size: int = 100,
+    store: PageStore = page_store,
+) -> dict[str, int]:
+    """
+    Rebuild films from the pages kept in the page store, e.g. after a change of
+    Movie.parse_page. No request is sent: the latest stored version of every movie
+    page (of the given external ids) is parsed by a pool of ``processes`` worker
+    processes, one per core by default, while this process writes the results.
+    Similar films of the new films are found once all pages are written.
+    """
+    if not store.enabled:
+        raise ValueError(
+            "The page store is not enabled, set PAGE_STORE or configure it"
+        )
+
+    urls = ids and [Movie.BASE_URL.format(external_id) for external_id in ids]
+    pages = (page for page in store.pages(urls) if Movie.id_from_url(page.url))
+
+    processes = processes or os.cpu_count()
+    totals = {"new": 0, "changed": 0, "unchanged": 0, "failed": 0}
+    started = monotonic()
+
+    new_ids = []
+
+    def write(future):
+        counts, ids = write_parsed(future.result())
+        for outcome, count in counts.items():
+            totals[outcome] += count
+        new_ids.extend(ids)
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=context) as executor:
+        pending = deque()
+        for chunk in chunked(pages, chunk_size):
+            pending.append(executor.submit(parse_stored, chunk))
+            # Keep every worker busy while the oldest chunk is written
+            if len(pending) > processes * 2:
+                write(pending.popleft())
+        while pending:
+            write(pending.popleft())
+    update_similar(new_ids)
+
+    elapsed = monotonic() - started
+    pages_count = sum(totals.values())
+    logger.info(
+        f"{pages_count} pages reparsed, {pages_count / elapsed:.2f} pages/sec: "
+        + ", ".join(f"{count} {outcome}" for outcome, count in totals.items()),
+        extra={"color": colorama.Fore.GREEN},
+    )
+    return totals
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=reparse_from_cache.__doc__)
+    arg_parser.add_argument(
+        "ids", type=int, nargs="*", help="external ids, all by default"
+    )
+    arg_parser.add_argument("--processes", type=int)
+    arg_parser.add_argument("--store", help="page store file, PAGE_STORE by default")
+    args = arg_parser.parse_args()
+
+    if args.store:
+        page_store.configure(args.store)
+    reparse_from_cache(args.ids or None, processes=args.processes)
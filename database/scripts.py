@@ -1,71 +1,69 @@
-import threading
+import logging
+import multiprocessing
+import os
+from functools import partial
+from itertools import chain
+from typing import Iterable
 
 import colorama
 import requests
-from django.db.models import Q
-from time import sleep
+from django.db import connections
 
 import init_django_orm  # noqa: F401
 
-from db.models import MovieMaker, Profession, Genre, Dubbing, Film
+from db import cache
+from db.models import CrawlShard, CrawlState, MovieMaker, Dubbing, Film
+from frontier import frontier
+from hdrezka_parser.limiter import rate_limiter
 from hdrezka_parser.parser import Movie
+from hdrezka_parser.retry import retry_stats
+from ingest import (
+    BulkFilmWriter,
+    MakerAccumulator,
+    add_maker_professions,
+    prepare_movie_maker,
+)
+from metrics import db_write_seconds, logger, pages_total, parse_seconds, serve
+from pipeline import Pipeline, Stage
+from search import index_films
+from shards import coordinator, worker_name
+from similar import update_similar
 from utils import print_info, Timer, ExceptionHandler
 
+Status = CrawlState.Status
+
 
 def get_dubbing(dubbings: list) -> list[Dubbing]:
     """
-    Retrieve existing Dubbing objects from the database based on the given list of names.
-    Create and retrieve any new Dubbing objects and return the complete list of objects.
+    Retrieve Dubbing objects for the given list of names, creating any new ones.
+    Names are resolved through the in-process cache, so known dubbings cost no query.
     """
 
     if not dubbings:
         return []
 
-    # Retrieve existing Dubbing objects from the database
-    existing_dubbings = Dubbing.objects.filter(name__in=dubbings)
-
-    if len(existing_dubbings) == len(dubbings):
-        return existing_dubbings
-
-    # Identify any names not found in existing Dubbing objects
-    existing_names = set(existing_dubbings.values_list("name", flat=True))
-    new_names = list(set(dubbings) - existing_names)
-
-    # Create new Dubbing objects for any names not found in existing Dubbing objects
-    new_dubbings = [Dubbing(name=name) for name in new_names]
-    Dubbing.objects.bulk_create(new_dubbings)
-
-    # Retrieve all Dubbing objects (including newly created objects)
-    all_dubbings = Dubbing.objects.filter(
-        Q(name__in=existing_names) | Q(name__in=new_names)
-    )
-
-    return all_dubbings
+    return [
+        Dubbing(pk=pk, name=name)
+        for name, pk in cache.dubbings.get_or_create_many(dubbings).items()
+    ]
 
 
-@print_info(message="was added to queue", color="white", method=lambda m: m.name)
+@print_info(
+    message="was added to queue",
+    color="white",
+    method=lambda m: m.name,
+    level=logging.DEBUG,
+)
 def add_movie_maker_to_database(movie_maker: dict, save: bool = True) -> MovieMaker:
     """
     Add a new MovieMaker object to the database based on the given dictionary.
     Return the newly created object.
     """
 
-    # Map "актриса" to "актер" in the profession list
-    movie_maker["profession"] = [
-        p if p != "актриса" else "актер" for p in movie_maker["profession"]
-    ]
-
-    # Fix birthdate format if needed
-    if movie_maker.get("birth_date"):
-        birth_date_parts = movie_maker["birth_date"].split("-")
-        for i in range(3):
-            if not int(birth_date_parts[i]):
-                birth_date_parts[i] = birth_date_parts[i].replace("0", "1", 1)
-        movie_maker["birth_date"] = "-".join(birth_date_parts)
+    movie_maker, profession_names = prepare_movie_maker(movie_maker)
 
-    # Get Profession objects for the given profession names
-    profession_names = movie_maker.pop("profession")
-    professions = Profession.objects.filter(name__in=profession_names)
+    # Get Profession ids for the given profession names
+    professions = cache.professions.get_many(profession_names).values()
 
     # Create and save new MovieMaker object
     movie_maker_obj = MovieMaker(**movie_maker)
@@ -73,8 +71,8 @@ def add_movie_maker_to_database(movie_maker: dict, save: bool = True) -> MovieMa
         movie_maker_obj.save()
 
         # Add Profession objects to MovieMaker object
-        [movie_maker_obj.profession.add(prof) for prof in professions]
-        print(colorama.Fore.GREEN + "and was saved" + colorama.Style.RESET_ALL)
+        movie_maker_obj.profession.add(*professions)
+        logger.debug("and was saved", extra={"color": colorama.Fore.GREEN})
 
     return movie_maker_obj
 
@@ -82,52 +80,80 @@ def add_movie_maker_to_database(movie_maker: dict, save: bool = True) -> MovieMa
 @print_info(message="makers was added to db")
 def save_movie_makers(makers: list) -> list[MovieMaker]:
     """
-    Bulk create new moviemakers in the database and return a list of makers.
+    Bulk create new moviemakers with their professions in the database
+    and return a list of makers.
 
     :param makers: A list of dictionaries containing moviemaker data.
     :return: A list of created moviemaker objects.
     """
-    makers = [add_movie_maker_to_database(maker, save=False) for maker in makers]
-    return MovieMaker.objects.bulk_create(makers)
+    prepared = [prepare_movie_maker(maker) for maker in makers]
+    # Another crawler process may have saved some of them in the meantime
+    maker_objs = MovieMaker.objects.bulk_create(
+        [MovieMaker(**fields) for fields, _ in prepared], ignore_conflicts=True
+    )
 
+    # Not every backend returns primary keys from a bulk insert
+    maker_ids = dict(
+        MovieMaker.objects.filter(
+            external_id__in=[fields["external_id"] for fields, _ in prepared]
+        ).values_list("external_id", "pk")
+    )
+    add_maker_professions(
+        {
+            maker_ids[fields["external_id"]]: professions
+            for fields, professions in prepared
+        }
+    )
 
-# использовать когда парсятся фильмы та актёры и продюсеры это словари
-def get_movie_makers(makers: [dict]) -> list[MovieMaker]:
+    for maker_obj in maker_objs:
+        maker_obj.pk = maker_ids[maker_obj.external_id]
+    return maker_objs
+
+
+def get_movie_maker_ids(makers: [dict]) -> dict[int, int]:
     """
-    Get a list of moviemakers from the database, creating new ones if necessary.
+    Map external ids of the given moviemakers to their primary keys,
+    creating the moviemakers that are not in the database yet.
 
     :param makers: A list of dictionaries containing moviemaker data.
-    :return: A list of moviemaker objects.
+    :return: A dict of external_id -> pk.
     """
 
-    # Create a list of moviemaker IDs from the given list of dictionaries
-    makers_ids = [int(maker["external_id"]) for maker in makers]
+    # Remove duplicates, the same person can be listed more than once
+    makers = {int(maker["external_id"]): maker for maker in makers}
 
-    # Find all moviemakers in the database with an external ID matching one of the IDs in the maker_ids list
-    existing_makers = MovieMaker.objects.filter(external_id__in=makers_ids)
+    # Known moviemakers are taken from the cache, only the rest are queried
+    maker_ids = cache.movie_makers.get_many(makers)
 
-    # If all of makers IDs in the list already exist in the database, return a list of their IDs
-    if len(makers) == len(existing_makers):
-        return existing_makers
+    # Create the moviemakers that do not exist yet
+    new_makers = [
+        maker for external_id, maker in makers.items() if external_id not in maker_ids
+    ]
+    if new_makers:
+        save_movie_makers(new_makers)
+        maker_ids.update(
+            cache.movie_makers.get_many(int(m["external_id"]) for m in new_makers)
+        )
 
-    # Create a set of existing maker IDs to check against when adding new makers to the database
-    existing_ids = list(existing_makers.values_list("external_id", flat=True))
+    return maker_ids
 
-    # Create a list of new movie makers to add to the database, skipping any makers that already exist
-    new_makers = save_movie_makers(
-        list(
-            filter(lambda maker: int(maker["external_id"]) not in existing_ids, makers)
-        )
-    )
 
-    # Return a list of all maker objects (existing and new)
-    return list(existing_makers) + list(new_makers)
+# использовать когда парсятся фильмы та актёры и продюсеры это словари
+def get_movie_makers(makers: [dict]) -> list[MovieMaker]:
+    """
+    Get a list of moviemakers from the database, creating new ones if necessary.
+
+    :param makers: A list of dictionaries containing moviemaker data.
+    :return: A lazy queryset of moviemaker objects.
+    """
+    return MovieMaker.objects.filter(pk__in=get_movie_maker_ids(makers).values())
 
 
 @print_info(
     message="was added to db",
     color="cyan",
     method=lambda f: f"Film {f} #{f.external_id}",
+    level=logging.DEBUG,
 )
 def add_film(film_data: dict) -> Film:
     """
@@ -139,42 +165,205 @@ def add_film(film_data: dict) -> Film:
     # Split release date string to get only the date and NULL if it NULL
     film_data["release"] = film_data["release"] and film_data["release"].split()[0]
 
-    # Get Genre objects for each genre name
-    genres = Genre.objects.filter(name__in=film_data.pop("genres"))
+    # Get Genre ids for each genre name
+    genres = cache.genres.get_many(film_data.pop("genres")).values()
 
-    # Get MovieMaker objects for each actor and director external ID
-    actors = get_movie_makers(film_data.pop("actors"))
-    directors = get_movie_makers(film_data.pop("directors"))
+    # Get MovieMaker ids for each actor and director external ID
+    actors = get_movie_maker_ids(film_data.pop("actors")).values()
+    directors = get_movie_maker_ids(film_data.pop("directors")).values()
 
-    # Get Dubbing objects for each dubbing language name
-    dubbings = get_dubbing(film_data.pop("dubbing"))
+    # Get Dubbing ids for each dubbing language name
+    dubbings = cache.dubbings.get_or_create_many(film_data.pop("dubbing") or [])
+    dubbings = dubbings.values()
 
     # Create Film object with given data
     film_obj = Film.objects.create(**film_data)
 
     # Set many-to-many relationships for genres, actors, directors, and dubbings
-    [film_obj.genres.add(genre) for genre in genres]
-    [film_obj.actors.add(actor) for actor in actors]
-    [film_obj.directors.add(director) for director in directors]
-    [film_obj.dubbing.add(dubbing) for dubbing in dubbings]
+    film_obj.genres.add(*genres)
+    film_obj.actors.add(*actors)
+    film_obj.directors.add(*directors)
+    film_obj.dubbing.add(*dubbings)
+    index_films([film_obj.pk])
 
     # Return created Film object
     return film_obj
 
 
 @print_info(message="films was add to database", color="LIGHTGREEN_EX")
-def add_films(films, start: int = 0):
+def add_films(films, start: int = 0, batch_size: int = 50):
+    """
+    Save parsed films to the database in batches with BulkFilmWriter.
+    """
     result = []
     films_count = len(films)
-    for i, film in list(enumerate(films))[start:]:
-        print(
-            f"Initializing adding to database: {i+1}/{films_count} - Movie ID: {film.get('external_id')}"
-        )
-        result.append(add_film(film))
+    writer = BulkFilmWriter()
+    for i in range(start, films_count, batch_size):
+        batch = films[i : i + batch_size]
+        logger.debug(f"Initializing adding to database: {i + len(batch)}/{films_count}")
+        result += writer.write(batch)
 
     return result
 
 
+def fetch_movie(parser_id: int) -> tuple[int, Movie | Exception]:
+    """
+    Download a movie page. A missing page is returned instead of raised.
+    """
+    try:
+        return parser_id, Movie(parser_id)
+    except requests.exceptions.HTTPError as e:
+        return parser_id, e
+
+
+def parse_movie(
+    fetched: tuple[int, Movie | Exception], with_trailer: bool = False
+) -> tuple[int, dict | Exception]:
+    """
+    Parse a downloaded movie page. Unexpected markup is returned instead of raised.
+    """
+    parser_id, page = fetched
+    if isinstance(page, Exception):
+        return fetched
+    try:
+        with parse_seconds.time(page="movie"):
+            return parser_id, page.parse_page(with_trailer=with_trailer)
+    except AttributeError as e:
+        return parser_id, e
+
+
+class FilmBatcher:
+    """
+    Ordered pipeline stage collecting parsed films and their makers into batches.
+
+    Pages arrive in id order, so ``stop_limit`` counts consecutive missing pages
+    exactly like a sequential crawl would. None disables the limit.
+    Once the limit is reached the pages after it, already fetched by then,
+    are dropped, the ones before it are still flushed.
+    """
+
+    def __init__(self, batch_size: int = 50, stop_limit: int | None = 10):
+        self.batch_size = batch_size
+        self.stop_limit = stop_limit
+        self.films = []
+        self.makers = MakerAccumulator()
+        self.missing = {Status.NOT_FOUND: [], Status.FAILED: []}
+        self.errors = 0
+        self.stopped = False
+
+    def __call__(self, parsed: tuple[int, dict | Exception]):
+        if self.stopped:
+            return None
+
+        parser_id, movie = parsed
+        logger.debug(f"parse movie #{parser_id}", extra={"color": colorama.Fore.BLUE})
+
+        if isinstance(movie, requests.exceptions.HTTPError):
+            self.errors += 1
+            self.missing[Status.NOT_FOUND].append(parser_id)
+            pages_total.inc(result=Status.NOT_FOUND)
+            logger.debug(str(movie), extra={"color": colorama.Fore.RED})
+            if self.stop_limit is not None and self.errors > self.stop_limit:
+                self.stopped = True
+                raise Exception(
+                    f"{self.stop_limit} last pages was returns without response"
+                )
+        elif isinstance(movie, AttributeError):
+            self.missing[Status.FAILED].append(parser_id)
+            pages_total.inc(result=Status.FAILED)
+            logger.warning(f"bad parser #{parser_id}")
+        else:
+            self.errors = 0
+            self.films.append(movie)
+            pages_total.inc(result=Status.DONE)
+            logger.debug(f"{movie['name']} was add to queue")
+            self.makers.extend(movie["actors"] + movie["directors"])
+
+        missing = sum(len(ids) for ids in self.missing.values())
+        if len(self.films) >= self.batch_size or missing >= self.batch_size:
+            return self.flush()
+        return None
+
+    def flush(self) -> dict | None:
+        if not self.films and not any(self.missing.values()):
+            return None
+
+        batch = {
+            "films": self.films,
+            "makers": self.makers.drain(),
+            "missing": self.missing,
+        }
+        self.films = []
+        self.missing = {Status.NOT_FOUND: [], Status.FAILED: []}
+        return batch
+
+
+def resolve_makers(batch: dict) -> dict:
+    get_movie_maker_ids(batch["makers"])
+    return batch
+
+
+def write_batch(batch: dict) -> list[int]:
+    """
+    Save the films of a batch and record the crawl result of every page in it.
+    Return the pks of the saved films.
+    """
+    with db_write_seconds.time(operation="films"):
+        films = add_films(batch["films"])
+    frontier.mark([film["external_id"] for film in batch["films"]], Status.DONE)
+    for status, ids in batch["missing"].items():
+        frontier.mark(ids, status)
+    return [film.pk for film in films]
+
+
+def crawl(
+    ids: Iterable[int],
+    stop_limit: int | None = 10,
+    workers: int = 1,
+    parse_workers: int = 1,
+    write_workers: int = 1,
+    batch_size: int = 50,
+    queue_size: int = 100,
+    with_trailers: bool = False,
+):
+    """
+    Run the given ids through the crawl pipeline in this process.
+    The request rate is left to the caller, see parse_films for the options.
+
+    Similar films of the saved films are found in one pass once the pipeline
+    is done, so the write stage only writes.
+    """
+    batcher = FilmBatcher(batch_size=batch_size, stop_limit=stop_limit)
+    saved = []
+
+    def write(batch: dict):
+        saved.extend(write_batch(batch))
+
+    # Batches are much bigger than pages, so fewer of them are kept in memory
+    batch_queue_size = max(1, queue_size // batch_size)
+
+    pipeline = Pipeline(
+        [
+            Stage("fetch", fetch_movie, workers, queue_size, skip_on_stop=True),
+            Stage(
+                "parse",
+                partial(parse_movie, with_trailer=with_trailers),
+                parse_workers,
+                queue_size,
+            ),
+            Stage("batch", batcher, 1, queue_size, ordered=True, flush=batcher.flush),
+            Stage("resolve", resolve_makers, 1, batch_queue_size),
+            Stage("write", write, write_workers, batch_queue_size),
+        ]
+    )
+    try:
+        pipeline.run(ids)
+    finally:
+        # Films saved before an error get their similar films too
+        with db_write_seconds.time(operation="similar"):
+            update_similar(saved)
+
+
 @Timer()
 @ExceptionHandler()
 def parse_films(
@@ -182,12 +371,41 @@ def parse_films(
     stop: int = None,
     count: int = 1000,
     ids: list[int] = None,
-    stop_limit: int = 10
+    stop_limit: int = 10,
+    workers: int = 1,
+    rate: float = 1.0,
+    parse_workers: int = 1,
+    write_workers: int = 1,
+    batch_size: int = 50,
+    queue_size: int = 100,
+    with_trailers: bool = False,
+    metrics_port: int = None,
+    processes: int = None,
+    shard_size: int = 1000,
 ):
-    films = []
-    makers = []
-    thread = None
-    errors = 0
+    """
+    Parse films by their external ids and save them to the database in batches.
+
+    Work is split into pipeline stages connected by bounded queues:
+    fetch -> parse -> batch -> resolve makers -> write.
+    Ids of a [start, stop) range known from the crawl state as done or missing
+    are skipped, an explicit ``ids`` list is crawled as given.
+
+    :param workers: number of threads downloading pages.
+    :param rate: maximum number of requests per second sent to the site.
+    :param parse_workers: number of threads parsing downloaded pages.
+    :param write_workers: number of threads writing batches to the database.
+    :param queue_size: maximum number of items waiting in front of each stage.
+    :param with_trailers: request trailers while parsing. By default they are left
+        for trailers.resolve_trailers or resolved when the bot first needs them.
+    :param metrics_port: expose the crawl metrics on http://localhost:port/metrics.
+    :param processes: crawl [start, stop) with this many processes, each running
+        its own pipeline. The range is split into shards of ``shard_size`` ids
+        handed out by shards.coordinator, ``rate`` is shared by all of them and by
+        workers started on other machines. ``stop_limit`` is not applied.
+    """
+    if metrics_port is not None:
+        serve(metrics_port)
 
     if ids is None:
 
@@ -196,67 +414,138 @@ def parse_films(
 
         ids = range(start, stop)
 
+    options = dict(
+        workers=workers,
+        parse_workers=parse_workers,
+        write_workers=write_workers,
+        batch_size=batch_size,
+        queue_size=queue_size,
+        with_trailers=with_trailers,
+    )
+
+    if processes:
+        if not isinstance(ids, range):
+            raise ValueError("A sharded crawl needs a range of ids, not a list.")
+        coordinator.create(ids.start, ids.stop, shard_size, rate)
+        crawl_in_processes(processes, ids=ids, **options)
+        return
+
+    if isinstance(ids, range):
+        # Pages already saved or known to be missing are not fetched again
+        ids = frontier.unknown(ids)
+
+    rate_limiter.configure(rate=rate)
     try:
-        for parser_id in ids:
-            print(
-                colorama.Fore.BLUE
-                + f"parse movie #{parser_id}"
-                + colorama.Style.RESET_ALL
+        crawl(ids, stop_limit=stop_limit, **options)
+    except Exception as e:
+        logger.error(str(e))
+        raise
+    finally:
+        logger.info(f"Retry stats: {retry_stats.snapshot()}")
+
+
+def shard_ids(shard: CrawlShard) -> list[int]:
+    """
+    Ids of a shard not crawled yet, e.g. by a worker that lost the shard.
+    """
+    crawled = set(
+        CrawlState.objects.filter(
+            external_id__gte=shard.first_id,
+            external_id__lt=shard.stop_id,
+            status__in=[Status.DONE, Status.NOT_FOUND],
+        ).values_list("external_id", flat=True)
+    )
+    return [i for i in range(shard.first_id, shard.stop_id) if i not in crawled]
+
+
+def crawl_shards(ids: range = None, **options):
+    """
+    Claim shards (of the given range of ids) and crawl them one after another
+    until none is left. Runs in every worker process of a sharded crawl.
+    """
+    owner = worker_name()
+    while (shard := coordinator.claim(owner, ids)) is not None:
+        pages = sum(pages_total.value(result=status) for status in Status)
+        films = pages_total.value(result=Status.DONE)
+
+        def progress() -> tuple[int, int]:
+            return (
+                sum(pages_total.value(result=status) for status in Status) - pages,
+                pages_total.value(result=Status.DONE) - films,
             )
+
+        logger.info(f"{owner} crawls shard {shard}")
+        error = None
+        with coordinator.keep_alive(shard, progress):
             try:
-                movie = Movie(parser_id).parse_page()
-                errors = 0
-            except requests.exceptions.HTTPError as e:
-                errors += 1
-                print(colorama.Fore.RED + str(e) + colorama.Style.RESET_ALL)
-                if errors > stop_limit:
-                    raise Exception(
-                        f"{stop_limit} last pages was returns without response"
-                    )
-                continue
-            except AttributeError:
-                print("bad parser")
-                continue
-
-            films.append(movie)
-            print(f"{movie['name']} was add to queue")
-            sleep(1)
-
-            for maker in movie["actors"] + movie["directors"]:
-                if maker["external_id"] in map(lambda x: x["external_id"], makers):
-                    continue
-                makers.append(maker)
-
-            if len(films) >= 50:
-                get_movie_makers(makers)
-                makers.clear()
-
-                if thread is not None and thread.is_alive():
-                    thread.join()
-                thread = threading.Thread(target=add_films, args=(films,), daemon=True)
-                thread.start()
-                films.clear()
+                crawl(shard_ids(shard), stop_limit=None, **options)
+            except Exception as e:
+                logger.error(f"Shard {shard} failed: {e!r}")
+                error = repr(e)
+        coordinator.finish(shard, *progress(), error=error)
 
-    except Exception as e:
-        print(colorama.Fore.RED + str(e) + colorama.Style.RESET_ALL)
-        raise
+    logger.info(f"Retry stats of {owner}: {retry_stats.snapshot()}")
+
+
+def crawl_in_processes(
+    processes: int = None, report_every: float = 30, ids: range = None, **options
+):
+    """
+    Start ``processes`` worker processes (one per core by default) crawling shards
+    of the coordinator, all of them or those of the range ``ids``, and report
+    the progress of the crawl until they exit.
+    """
+    processes = processes or os.cpu_count()
+    # Fresh interpreters, forking would copy the running threads and connections
+    context = multiprocessing.get_context("spawn")
+    connections.close_all()
+    pool = [
+        context.Process(
+            target=crawl_shards, kwargs={"ids": ids, **options}, name=f"crawler-{i}"
+        )
+        for i in range(processes)
+    ]
+    for process in pool:
+        process.start()
+
+    try:
+        for process in pool:
+            while process.is_alive():
+                process.join(report_every)
+                coordinator.report(ids)
     finally:
-        get_movie_makers(makers)
-        add_films(films)
+        for process in pool:
+            if process.is_alive():
+                process.terminate()
 
-        if thread is not None and thread.is_alive():
-            thread.join()
-            print("All threads are joined.")
+    coordinator.report(ids)
+    failed = [process.name for process in pool if process.exitcode != 0]
+    if failed:
+        raise Exception(f"Crawler processes exited with an error: {failed}")
+    if unfinished := coordinator.unfinished(ids):
+        raise Exception(f"{unfinished} shards were not crawled")
 
 
 def get_empty_ids():
     """
     Returns a list of empty external_ids that can be used to create new Film objects.
+    Ids known to be missing on the site are not included.
+    Only seeded ids are known, call frontier.seed() first to add the new ones.
     """
-    used_ids = set(Film.objects.all().values_list("external_id", flat=True))
-    all_ids = set(range(1, max(used_ids)))
+    return list(frontier.pending())
+
 
-    return sorted(all_ids - used_ids)
+def crawl_pending(count: int = 1000, **kwargs):
+    """
+    Resume the crawl from the saved crawl state: pending and failed ids first,
+    then ``count`` new ids after the last known one.
+    """
+    frontier.seed()
+    last_id = frontier.last_id()
+    ids = chain(
+        frontier.pending(stop=last_id + 1), range(last_id + 1, last_id + 1 + count)
+    )
+    parse_films(ids=ids, **kwargs)
 
 
 def get_last_film(order_by: str = "external_id", desc=True):
@@ -0,0 +1,126 @@
+import re
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import Q
+
+import init_django_orm  # noqa: F401
+
+from db.models import Film, FilmSearch
+from db.queries import keyset_chunks
+
+# Created by the 0010_filmsearch migration on SQLite
+FTS_TABLE = "db_filmsearch_fts"
+
+WORD = re.compile(r"\w+")
+
+
+def build_documents(film_ids: Iterable[int]) -> dict[int, str]:
+    """
+    Searchable text of every given film, read with one query per relation.
+    """
+    names = {
+        pk: [name, original_name]
+        for pk, name, original_name in Film.objects.filter(pk__in=film_ids).values_list(
+            "pk", "name", "original_name"
+        )
+    }
+    for relation in ("actors", "directors"):
+        through = getattr(Film, relation).through
+        for film_id, maker_name in through.objects.filter(
+            film_id__in=names
+        ).values_list("film_id", "moviemaker__name"):
+            names[film_id].append(maker_name)
+
+    return {pk: " ".join(filter(None, parts)) for pk, parts in names.items()}
+
+
+def index_films(film_ids: Iterable[int]):
+    """
+    Write the search documents of the given films, replacing the old ones.
+    Called whenever films are saved or their relations change.
+    """
+    documents = build_documents(list(film_ids))
+    FilmSearch.objects.filter(film_id__in=documents).delete()
+    FilmSearch.objects.bulk_create(
+        [
+            FilmSearch(film_id=pk, document=document)
+            for pk, document in documents.items()
+        ]
+    )
+
+
+def index_makers(maker_ids: Iterable[int]):
+    """
+    Rewrite the search documents of the films of the given moviemakers,
+    e.g. after their names changed.
+    """
+    maker_ids = list(maker_ids)
+    film_ids = set()
+    for relation in ("actors", "directors"):
+        through = getattr(Film, relation).through
+        film_ids.update(
+            through.objects.filter(moviemaker_id__in=maker_ids).values_list(
+                "film_id", flat=True
+            )
+        )
+    index_films(film_ids)
+
+
+def rebuild_index(chunk_size: int = 1000):
+    """
+    Index every saved film again, e.g. after changing the documents. The films saved
+    before the search existed are indexed by the 0013_filmsearch_backfill migration.
+    """
+    films = Film.objects.values_list("pk", flat=True)
+    for chunk in keyset_chunks(films, chunk_size=chunk_size):
+        index_films(chunk)
+
+
+def _sqlite_ids(words: list[str], limit: int) -> list[int]:
+    # Every word is matched as a prefix: "хэнк" finds "Хэнкс"
+    query = " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY rank LIMIT %s",
+            [query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _postgres_ids(words: list[str], limit: int) -> list[int]:
+    # ILIKE is served by the trigram index, the best matching words go first
+    where = " AND ".join(["document ILIKE %s"] * len(words))
+    patterns = [f"%{connection.ops.prep_for_like_query(word)}%" for word in words]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT film_id FROM {FilmSearch._meta.db_table} WHERE {where} "
+            f"ORDER BY word_similarity(%s, document) DESC LIMIT %s",
+            [*patterns, " ".join(words), limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _scan_ids(words: list[str], limit: int) -> list[int]:
+    documents = FilmSearch.objects.filter(
+        *[Q(document__icontains=word) for word in words]
+    )
+    return list(documents.values_list("film_id", flat=True)[:limit])
+
+
+def search_films(query: str, limit: int = 10) -> list[Film]:
+    """
+    Films whose title, original title or actor and director names contain
+    every word of the query, best matches first.
+    """
+    words = WORD.findall(query.lower())
+    if not words:
+        return []
+
+    search = {"sqlite": _sqlite_ids, "postgresql": _postgres_ids}.get(
+        connection.vendor, _scan_ids
+    )
+    ids = search(words, limit)
+    films = Film.objects.in_bulk(ids)
+    return [films[pk] for pk in ids if pk in films]
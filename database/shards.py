@@ -0,0 +1,270 @@
+"""
+Coordinator of a crawl split into shards of external ids.
+
+The shards are rows of the CrawlShard table, so worker processes on any number of
+machines pointed at the same database take part in the crawl: a worker claims a
+shard, crawls it and reports its progress until no shard is left. A worker that
+stops sending heartbeats loses its shard to the others after ``lease`` seconds.
+
+The request rate stored with the shards is shared by all live workers,
+every worker sends its share: ``rate / live workers``.
+
+Start workers on another machine with
+    python shards.py worker --processes 8
+and follow the crawl with
+    python shards.py status
+Both take ``--ids START STOP`` to keep to the shards of one crawl.
+"""
+
+import argparse
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable
+
+import colorama
+from django.db import connection
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Now
+
+import init_django_orm  # noqa: F401
+
+from db.models import CrawlShard
+from hdrezka_parser.limiter import rate_limiter
+from metrics import logger
+
+Status = CrawlShard.Status
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ShardCoordinator:
+    def __init__(
+        self, lease: float = 120, heartbeat_every: float = 15, max_attempts: int = 3
+    ):
+        self.lease = lease
+        self.heartbeat_every = heartbeat_every
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def shards(ids: range = None):
+        """
+        Shards overlapping the given range of ids, all shards by default.
+        """
+        shards = CrawlShard.objects.all()
+        if ids is not None:
+            shards = shards.filter(first_id__lt=ids.stop, stop_id__gt=ids.start)
+        return shards
+
+    def create(
+        self, start: int, stop: int, shard_size: int = 1000, rate: float = 1.0
+    ) -> int:
+        """
+        Split [start, stop) into shards. Shards that already overlap the range are
+        kept whatever their size and only the gaps between them are split, so a
+        crawl is resumed by creating it again, even with another shard size.
+        The kept shards take the new rate and failed ones get their attempts back.
+        Return the number of shards of the range.
+        """
+        ids = range(start, stop)
+
+        def split(first: int, last: int) -> list[CrawlShard]:
+            return [
+                CrawlShard(first_id=i, stop_id=min(i + shard_size, last), rate=rate)
+                for i in range(first, last, shard_size)
+            ]
+
+        new_shards = []
+        cursor = start
+        for first_id, stop_id in (
+            self.shards(ids).order_by("first_id").values_list("first_id", "stop_id")
+        ):
+            new_shards += split(cursor, first_id)
+            cursor = max(cursor, stop_id)
+        new_shards += split(cursor, stop)
+        CrawlShard.objects.bulk_create(new_shards)
+
+        self.shards(ids).exclude(rate=rate).update(rate=rate, updated_at=Now())
+        self.shards(ids).filter(status=Status.FAILED).update(
+            status=Status.PENDING, attempts=0, updated_at=Now()
+        )
+        return self.shards(ids).count()
+
+    def _expired(self):
+        # The database clock is used, clocks of the worker machines may differ
+        return Now() - timedelta(seconds=self.lease)
+
+    def claim(self, owner: str, ids: range = None) -> CrawlShard | None:
+        """
+        Take the first pending shard (of the given range of ids), a failed one
+        with attempts left, or one whose owner stopped sending heartbeats.
+        """
+        while True:
+            shard = (
+                self.shards(ids)
+                .filter(
+                    Q(status=Status.PENDING)
+                    | Q(status=Status.FAILED, attempts__lt=self.max_attempts)
+                    | Q(status=Status.CLAIMED, heartbeat_at__lt=self._expired())
+                )
+                .order_by("first_id")
+                .first()
+            )
+            if shard is None:
+                return None
+
+            # Compare and set on attempts, only one of the racing workers wins
+            claimed = CrawlShard.objects.filter(
+                pk=shard.pk, attempts=shard.attempts
+            ).update(
+                status=Status.CLAIMED,
+                owner=owner,
+                attempts=F("attempts") + 1,
+                processed=0,
+                films=0,
+                error=None,
+                heartbeat_at=Now(),
+                updated_at=Now(),
+            )
+            if claimed:
+                shard.refresh_from_db()
+                return shard
+
+    def heartbeat(self, shard: CrawlShard, processed: int, films: int) -> bool:
+        """
+        Record the progress of a claimed shard.
+        Return False if the shard was taken over by another worker.
+        """
+        return bool(
+            CrawlShard.objects.filter(
+                pk=shard.pk, owner=shard.owner, status=Status.CLAIMED
+            ).update(
+                processed=processed,
+                films=films,
+                heartbeat_at=Now(),
+                updated_at=Now(),
+            )
+        )
+
+    def finish(self, shard: CrawlShard, processed: int, films: int, error: str = None):
+        CrawlShard.objects.filter(pk=shard.pk, owner=shard.owner).update(
+            status=Status.FAILED if error else Status.DONE,
+            processed=processed,
+            films=films,
+            error=error,
+            heartbeat_at=Now(),
+            updated_at=Now(),
+        )
+
+    def live_workers(self) -> int:
+        return CrawlShard.objects.filter(
+            status=Status.CLAIMED, heartbeat_at__gte=self._expired()
+        ).count()
+
+    def share_rate(self, shard: CrawlShard):
+        """
+        Limit this process to its share of the rate of the crawl.
+        """
+        rate = shard.rate / max(1, self.live_workers())
+        if rate != rate_limiter.rate:
+            rate_limiter.configure(rate=rate)
+
+    @contextmanager
+    def keep_alive(self, shard: CrawlShard, progress: Callable[[], tuple[int, int]]):
+        """
+        Send heartbeats with ``progress()`` (processed pages, saved films)
+        and rebalance the rate from a background thread while the shard is crawled.
+        """
+        self.share_rate(shard)
+        done = threading.Event()
+
+        def beat():
+            try:
+                while not done.wait(self.heartbeat_every):
+                    if not self.heartbeat(shard, *progress()):
+                        logger.warning(
+                            f"Shard {shard} was taken over by another worker"
+                        )
+                    self.share_rate(shard)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat, name="shard-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def progress(self, ids: range = None) -> dict:
+        """
+        Shards by status, pages processed and films saved by the whole crawl
+        or by the shards of the given range of ids.
+        """
+        shards = {
+            row["status"]: row["count"]
+            for row in self.shards(ids).values("status").annotate(count=Count("id"))
+        }
+        totals = self.shards(ids).aggregate(
+            processed=Sum("processed"), films=Sum("films")
+        )
+        return {
+            "shards": shards,
+            "workers": self.live_workers(),
+            "processed": totals["processed"] or 0,
+            "films": totals["films"] or 0,
+        }
+
+    def unfinished(self, ids: range = None) -> int:
+        return self.shards(ids).exclude(status=Status.DONE).count()
+
+    def report(self, ids: range = None):
+        progress = self.progress(ids)
+        shards = ", ".join(
+            f"{name}: {count}" for name, count in progress["shards"].items()
+        )
+        logger.info(
+            f"Shards: {shards}, {progress['workers']} workers, "
+            f"{progress['processed']} pages processed, {progress['films']} films saved",
+            extra={"color": colorama.Fore.MAGENTA},
+        )
+
+
+coordinator = ShardCoordinator()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="crawl shards until none is left")
+    worker.add_argument("--processes", type=int, default=os.cpu_count())
+    worker.add_argument("--workers", type=int, default=4)
+    status = commands.add_parser("status", help="print the progress of the crawl")
+    for command in (worker, status):
+        command.add_argument(
+            "--ids",
+            type=int,
+            nargs=2,
+            metavar=("START", "STOP"),
+            help="only the shards of [START, STOP)",
+        )
+    args = arg_parser.parse_args()
+
+    ids = args.ids and range(*args.ids)
+
+    if args.command == "status":
+        coordinator.report(ids)
+        return
+
+    from scripts import crawl_in_processes
+
+    crawl_in_processes(args.processes, ids=ids, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import math
+import threading
+from collections import defaultdict
+from heapq import nlargest
+from typing import Iterable
+
+import colorama
+from django.db import transaction
+from django.db.models import Count
+
+import init_django_orm  # noqa: F401
+
+from db.models import Film, SimilarFilm
+from db.queries import chunked, through_table
+from metrics import logger
+from utils import Timer
+
+# Relation -> weight of a shared item. A shared director says more than a genre.
+RELATION_WEIGHTS = {
+    "genres": 1.0,
+    "actors": 1.0,
+    "directors": 2.0,
+    "dubbing": 0.3,
+}
+RELATIONS = list(RELATION_WEIGHTS)
+
+# Features shared by more films are only added to the score of films that are
+# already candidates, they do not make films candidates themselves.
+MAX_DF = 1000
+
+CHUNK_SIZE = 500
+
+# Batches written by concurrent pipeline workers update overlapping lists
+_update_lock = threading.Lock()
+
+
+def feature(relation: str, pk: int) -> int:
+    """
+    Encode a related object as one int, e.g. the 5th genre and the 5th actor differ.
+    """
+    return pk * len(RELATIONS) + RELATIONS.index(relation)
+
+
+def feature_weight(value: int) -> float:
+    return RELATION_WEIGHTS[RELATIONS[value % len(RELATIONS)]]
+
+
+def load_features(film_ids: Iterable[int] = None) -> dict[int, set[int]]:
+    """
+    Sparse feature vector of every given film (of every film by default):
+    the set of its genres, actors, directors and dubbings.
+    """
+    features = defaultdict(set)
+    for relation in RELATIONS:
+        through, column = through_table(Film, relation)
+        rows = through.objects.values_list("film_id", column)
+        if film_ids is None:
+            chunks = [rows.iterator(chunk_size=10_000)]
+        else:
+            chunks = (
+                rows.filter(film_id__in=ids) for ids in chunked(film_ids, CHUNK_SIZE)
+            )
+        for chunk in chunks:
+            for film_id, pk in chunk:
+                features[film_id].add(feature(relation, pk))
+    return features
+
+
+def count_films(features: Iterable[int]) -> dict[int, int]:
+    """
+    Number of films having each of the given features, counted by the database.
+    """
+    by_relation = defaultdict(list)
+    for value in set(features):
+        by_relation[RELATIONS[value % len(RELATIONS)]].append(value // len(RELATIONS))
+
+    df = {}
+    for relation, pks in by_relation.items():
+        through, column = through_table(Film, relation)
+        for ids in chunked(pks, CHUNK_SIZE):
+            counts = (
+                through.objects.filter(**{f"{column}__in": ids})
+                .values_list(column)
+                .annotate(films=Count("film_id"))
+            )
+            df.update({feature(relation, pk): films for pk, films in counts})
+    return df
+
+
+def top_similar(
+    targets: Iterable[int],
+    features: dict[int, set[int]],
+    df: dict[int, int],
+    films_count: int,
+    k: int | None = 10,
+) -> dict[int, list[tuple[int, float]]]:
+    """
+    Cosine similarity of tf-idf weighted feature vectors, computed through an
+    inverted index, so only films sharing a feature are ever compared.
+    Return the ``k`` most similar films of every target with their scores,
+    all of them if ``k`` is None.
+    """
+    weights = {
+        value: feature_weight(value) * math.log(films_count / count)
+        for value, count in df.items()
+        if count
+    }
+    norms = {
+        film: math.sqrt(sum(weights.get(value, 0) ** 2 for value in values))
+        for film, values in features.items()
+    }
+
+    postings = defaultdict(list)
+    for film, values in features.items():
+        for value in values:
+            if df.get(value, 0) <= MAX_DF:
+                postings[value].append(film)
+
+    similar = {}
+    for film in targets:
+        values = features.get(film, ())
+        dots = defaultdict(float)
+        for value in values:
+            for other in postings.get(value, ()):
+                dots[other] += weights.get(value, 0) ** 2
+        dots.pop(film, None)
+
+        frequent = [value for value in values if df.get(value, 0) > MAX_DF]
+        for other in dots:
+            for value in frequent:
+                if value in features[other]:
+                    dots[other] += weights[value] ** 2
+
+        scores = (
+            (other, dot / (norms[film] * norms[other]))
+            for other, dot in dots.items()
+            if dot and norms[film] and norms[other]
+        )
+        if k is None:
+            similar[film] = sorted(scores, key=lambda pair: pair[1], reverse=True)
+        else:
+            similar[film] = nlargest(k, scores, key=lambda pair: pair[1])
+    return similar
+
+
+def save_similar(similar: dict[int, list[tuple[int, float]]]):
+    """
+    Replace the stored similar films of the given films.
+    """
+    with transaction.atomic():
+        for ids in chunked(similar, CHUNK_SIZE):
+            SimilarFilm.objects.filter(film_id__in=ids).delete()
+        SimilarFilm.objects.bulk_create(
+            [
+                SimilarFilm(film_id=film, similar_id=other, score=score)
+                for film, pairs in similar.items()
+                for other, score in pairs
+            ],
+            batch_size=5000,
+        )
+
+
+@Timer()
+def build_similar(k: int = 10):
+    """
+    Recompute the similar films of the whole catalogue in one batch.
+    """
+    features = load_features()
+    df = defaultdict(int)
+    for values in features.values():
+        for value in values:
+            df[value] += 1
+
+    similar = top_similar(features, features, df, len(features), k)
+    save_similar(similar)
+    logger.info(
+        f"Similar films of {len(similar)} films saved",
+        extra={"color": colorama.Fore.GREEN},
+    )
+
+
+def update_similar(film_ids: Iterable[int], k: int = 10):
+    """
+    Compute the similar films of new films and add the new films to the lists
+    of the existing films they beat. Only films sharing a rare enough feature
+    with a new film are read, new films are handled ``CHUNK_SIZE`` at a time.
+    Stored scores are not recomputed as the catalogue grows, build_similar
+    refreshes all of them.
+    """
+    with _update_lock:
+        for ids in chunked(sorted(set(film_ids)), CHUNK_SIZE):
+            _update_similar(set(ids), k)
+
+
+def _update_similar(film_ids: set[int], k: int):
+    features = load_features(film_ids)
+    df = count_films(value for values in features.values() for value in values)
+
+    candidates = set()
+    for relation in RELATIONS:
+        through, column = through_table(Film, relation)
+        pks = [
+            value // len(RELATIONS)
+            for value, count in df.items()
+            if count <= MAX_DF and RELATIONS[value % len(RELATIONS)] == relation
+        ]
+        for ids in chunked(pks, CHUNK_SIZE):
+            candidates.update(
+                through.objects.filter(**{f"{column}__in": ids}).values_list(
+                    "film_id", flat=True
+                )
+            )
+    candidates -= film_ids
+
+    features.update(load_features(candidates))
+    df.update(
+        count_films(
+            value for film in candidates for value in features[film] if value not in df
+        )
+    )
+    scores = top_similar(film_ids, features, df, Film.objects.count(), k=None)
+    similar = {film: pairs[:k] for film, pairs in scores.items()}
+
+    # Existing films keep their best k, now chosen among the old and new ones
+    stored = defaultdict(list)
+    for ids in chunked(candidates, CHUNK_SIZE):
+        for film, other, score in SimilarFilm.objects.filter(
+            film_id__in=ids
+        ).values_list("film_id", "similar_id", "score"):
+            stored[film].append((other, score))
+
+    changed = {}
+    for film, pairs in scores.items():
+        for other, score in pairs:
+            if other in film_ids:
+                continue
+            current = stored[other]
+            if len(current) < k or score > min(s for _, s in current):
+                current.append((film, score))
+                changed[other] = current
+
+    similar.update(
+        {
+            film: nlargest(k, pairs, key=lambda pair: pair[1])
+            for film, pairs in changed.items()
+        }
+    )
+    save_similar(similar)
+
+
+def similar_films(film: Film, limit: int = 10) -> list[Film]:
+    """
+    Precomputed similar films of a film, most similar first.
+    """
+    return [
+        row.similar
+        for row in film.similar_films.select_related("similar").order_by("-score")[
+            :limit
+        ]
+    ]
@@ -0,0 +1,33 @@
+import requests
+from django.test import SimpleTestCase
+
+from db.models import CrawlState
+from scripts import FilmBatcher
+
+Status = CrawlState.Status
+
+
+def page(external_id: int):
+    if 10 <= external_id <= 25:
+        return external_id, requests.exceptions.HTTPError(f"404 {external_id}")
+    movie = {"external_id": external_id, "name": f"Film {external_id}"}
+    return external_id, {**movie, "actors": [], "directors": []}
+
+
+class StopLimitTest(SimpleTestCase):
+    def test_pages_after_the_limit_are_dropped(self):
+        batcher = FilmBatcher(batch_size=100, stop_limit=10)
+        raised = 0
+        for external_id in range(1, 41):
+            try:
+                batcher(page(external_id))
+            except Exception:
+                raised += 1
+
+        batch = batcher.flush()
+
+        self.assertEqual(raised, 1)
+        self.assertEqual(
+            [film["external_id"] for film in batch["films"]], list(range(1, 10))
+        )
+        self.assertEqual(batch["missing"][Status.NOT_FOUND], list(range(10, 21)))
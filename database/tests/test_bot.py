@@ -0,0 +1,18 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from bot.bot import FilmBot
+
+
+class ScheduledPostTest(SimpleTestCase):
+    def test_connections_are_recycled_around_a_scheduled_post(self):
+        film_bot = FilmBot("123:token", chat_id=1)
+        # An empty queue is filled on the scheduler thread
+        posts = film_bot.channels[1] = mock.Mock(**{"pop.return_value": None})
+
+        with mock.patch("bot.bot.close_old_connections") as close_old_connections:
+            film_bot.scheduler.jobs.run_all()
+
+        posts.fill.assert_called_once_with()
+        self.assertEqual(close_old_connections.call_count, 2)
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from db.cache import EntityCache, NameCache
+from db.models import Genre, MovieMaker
+
+
+class EntityCacheTest(TransactionTestCase):
+    def test_pks_of_a_rolled_back_transaction_are_not_kept(self):
+        makers = EntityCache(MovieMaker, "external_id")
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            maker = MovieMaker.objects.create(external_id=777, name="Maker")
+            self.assertEqual(makers.get_many([777]), {777: maker.pk})
+            raise RuntimeError("rollback")
+
+        self.assertEqual(len(makers), 0)
+        self.assertEqual(makers.get_many([777]), {})
+
+    def test_pks_are_kept_once_committed(self):
+        makers = EntityCache(MovieMaker, "external_id")
+
+        with transaction.atomic():
+            created = makers.get_or_create_many(
+                [1, 2], {1: {"name": "A"}, 2: {"name": "B"}}
+            )
+            self.assertEqual(len(makers), 0)
+
+        self.assertEqual(len(makers), 2)
+        self.assertEqual(makers.get_many([1, 2]), created)
+
+
+class NameCacheTest(TransactionTestCase):
+    def test_names_added_after_the_warm_up_are_found(self):
+        genres = NameCache(Genre)
+        drama = Genre.objects.create(name="Драма")
+        self.assertEqual(genres.get_many(["Драма"]), {"Драма": drama.pk})
+
+        comedy = Genre.objects.create(name="Комедия")
+
+        self.assertEqual(genres.get_many(["Комедия"]), {"Комедия": comedy.pk})
@@ -0,0 +1,80 @@
+from unittest import mock
+
+import requests
+from django.test import TestCase, TransactionTestCase
+
+from db import cache
+from db.models import Film, FilmSearch, MovieMaker
+from enrich import enrich_makers, makers_to_enrich, write_makers
+from search import index_films
+
+
+class WriteMakersTest(TestCase):
+    def setUp(self):
+        cache.movie_makers.clear()
+        self.film = Film.objects.create(external_id=1, name="Film")
+        self.renamed = MovieMaker.objects.create(external_id=10, name="Smith")
+        self.kept = MovieMaker.objects.create(external_id=11, name="Jones")
+        self.film.actors.add(self.renamed)
+        self.other = Film.objects.create(external_id=2, name="Other")
+        self.other.directors.add(self.kept)
+        index_films([self.film.pk, self.other.pk])
+
+    def test_films_of_renamed_makers_are_reindexed(self):
+        write_makers(
+            [
+                {"external_id": "10", "name": "John Smith", "profession": ["актер"]},
+                {"external_id": "11", "name": "Jones", "profession": ["режиссер"]},
+            ]
+        )
+
+        self.assertEqual(
+            FilmSearch.objects.get(film=self.film).document, "Film John Smith"
+        )
+        self.assertEqual(
+            FilmSearch.objects.get(film=self.other).document, "Other Jones"
+        )
+
+
+class FakeMaker:
+    """
+    Profile page answering by id: 1 parses, 2 has unexpected markup, 3 is missing,
+    4 raises an unexpected error.
+    """
+
+    def __init__(self, external_id: int):
+        if external_id == 3:
+            raise requests.exceptions.HTTPError("404")
+        if external_id == 4:
+            raise RuntimeError("connection reset")
+        self.id = external_id
+
+    def parse_page(self) -> dict:
+        if self.id == 2:
+            raise AttributeError("'NoneType' object has no attribute 'text'")
+        return {"external_id": str(self.id), "name": "Full Name", "profession": []}
+
+
+@mock.patch("enrich.Maker", FakeMaker)
+class EnrichMakersTest(TransactionTestCase):
+    def setUp(self):
+        cache.movie_makers.clear()
+        MovieMaker.objects.bulk_create(
+            MovieMaker(external_id=i, name="Name") for i in range(1, 4)
+        )
+
+    def test_unparsable_makers_are_not_picked_again(self):
+        enrich_makers(workers=2, rate=1000)
+
+        self.assertEqual(list(makers_to_enrich()), [])
+        self.assertTrue(MovieMaker.objects.get(external_id=2).enrich_failed)
+        self.assertIsNone(MovieMaker.objects.get(external_id=2).enriched_at)
+        self.assertEqual(MovieMaker.objects.get(external_id=1).name, "Full Name")
+
+    def test_profiles_parsed_before_an_error_are_saved(self):
+        MovieMaker.objects.create(external_id=4, name="Name")
+
+        with self.assertRaises(RuntimeError):
+            enrich_makers(workers=1, rate=1000)
+
+        self.assertIsNotNone(MovieMaker.objects.get(external_id=1).enriched_at)
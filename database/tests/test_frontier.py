@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from db.models import CrawlState, Film
+from frontier import CrawlFrontier
+from scripts import get_empty_ids
+
+Status = CrawlState.Status
+
+
+class SeedTest(TestCase):
+    def setUp(self):
+        Film.objects.bulk_create(
+            Film(external_id=i, name=f"Film {i}")
+            for i in range(1, 21)
+            if i not in (5, 12)
+        )
+
+    def test_gaps_below_marked_ids_are_seeded(self):
+        frontier = CrawlFrontier(chunk_size=8)
+        frontier.mark([21, 22], Status.DONE)
+
+        frontier.seed()
+
+        self.assertEqual(list(frontier.pending()), [5, 12])
+
+    def test_get_empty_ids_after_mark(self):
+        frontier = CrawlFrontier()
+        frontier.mark([21, 22], Status.DONE)
+
+        with mock.patch("scripts.frontier", frontier):
+            self.assertEqual(get_empty_ids(), [])
+            self.assertEqual(CrawlState.objects.count(), 2)
+
+            frontier.seed()
+            self.assertEqual(get_empty_ids(), [5, 12])
+
+    def test_seed_only_looks_past_the_seeded_ids(self):
+        frontier = CrawlFrontier(chunk_size=8)
+        frontier.seed()
+
+        # The last saved film only
+        with self.assertNumQueries(1):
+            frontier.seed()
+
+        Film.objects.create(external_id=30, name="Film 30")
+        frontier.seed()
+
+        self.assertEqual(list(frontier.pending()), [5, 12, *range(21, 30)])
+        self.assertEqual(CrawlState.objects.count(), 30)
+
+    def test_seed_keeps_existing_states(self):
+        frontier = CrawlFrontier(chunk_size=8)
+        frontier.mark([5], Status.NOT_FOUND)
+
+        frontier.seed()
+        frontier.seed()
+
+        self.assertEqual(list(frontier.pending()), [12])
+        self.assertEqual(CrawlState.objects.count(), 20)
+
+    def test_unknown_skips_done_and_missing_ids(self):
+        frontier = CrawlFrontier(chunk_size=8)
+        frontier.seed()
+        frontier.mark([12], Status.NOT_FOUND)
+        frontier.mark([21], Status.FAILED)
+
+        self.assertEqual(list(frontier.unknown(range(1, 24))), [5, 21, 22, 23])
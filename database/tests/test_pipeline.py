@@ -0,0 +1,16 @@
+from django.test import SimpleTestCase
+
+from hdrezka_parser.session import session_pool
+from pipeline import Pipeline, Stage
+
+
+class PipelineTest(SimpleTestCase):
+    def test_worker_sessions_are_closed_with_their_threads(self):
+        def fetch(item):
+            session_pool.session
+            return item
+
+        for _ in range(5):
+            Pipeline([Stage("fetch", fetch, workers=4)]).run(range(20))
+
+        self.assertEqual(len(session_pool._sessions), 0)
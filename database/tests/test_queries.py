@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from db.models import Film
+from db.queries import chunked, keyset_chunks
+
+
+class KeysetChunksTest(TestCase):
+    def setUp(self):
+        Film.objects.bulk_create(
+            Film(external_id=i, name=f"Film {i}") for i in range(1, 8)
+        )
+
+    def test_rows_of_every_shape(self):
+        films = Film.objects.all()
+        for rows, last in [
+            (films.values_list("external_id", flat=True), lambda row: row),
+            (films.values_list("external_id", "name"), lambda row: row[0]),
+            (films.values("external_id"), lambda row: row["external_id"]),
+            (films, lambda row: row.external_id),
+        ]:
+            chunks = list(keyset_chunks(rows, "external_id", chunk_size=3))
+
+            self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+            self.assertEqual([last(chunk[-1]) for chunk in chunks], [3, 6, 7])
+
+    def test_rows_leaving_the_queryset_do_not_shift_the_chunks(self):
+        seen = []
+        films = Film.objects.filter(rating__isnull=True).values_list("pk", flat=True)
+        for chunk in keyset_chunks(films, chunk_size=2):
+            seen += chunk
+            Film.objects.filter(pk__in=chunk).update(rating=5)
+
+        self.assertEqual(len(seen), 7)
+
+
+class ChunkedTest(TestCase):
+    def test_chunked(self):
+        self.assertEqual(list(chunked(iter(range(5)), 2)), [[0, 1], [2, 3], [4]])
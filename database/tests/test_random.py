@@ -0,0 +1,34 @@
+import random
+from collections import Counter
+
+from django.test import TestCase
+
+from db.models import Film
+
+
+class RandomFilmTest(TestCase):
+    def setUp(self):
+        # Well rated films are sparse and spread between gaps of the pk range
+        Film.objects.bulk_create(
+            Film(external_id=i, name=f"Film {i}", rating=8 if i % 7 == 0 else 5)
+            for i in range(1, 141)
+        )
+        Film.objects.filter(external_id__in=range(20, 60)).delete()
+
+    def test_picks_are_uniform_over_the_filtered_films(self):
+        random.seed(15)
+        films = Film.objects.filter(rating__gte=7)
+        picks = Counter(films.random().external_id for _ in range(3000))
+
+        self.assertEqual(set(picks), set(films.values_list("external_id", flat=True)))
+        # 200 expected picks for each of the 15 films
+        self.assertLess(max(picks.values()) - min(picks.values()), 120)
+
+    def test_selective_filter_falls_back_to_an_offset(self):
+        self.assertEqual(Film.objects.filter(external_id=140).random().external_id, 140)
+        self.assertIsNone(Film.objects.filter(rating__gte=9).random())
+
+    def test_empty_table(self):
+        Film.objects.all().delete()
+
+        self.assertIsNone(Film.objects.random())
@@ -0,0 +1,84 @@
+import tempfile
+import threading
+from time import sleep
+from unittest import mock
+
+import requests
+
+from django.test import SimpleTestCase
+
+from hdrezka_parser import request
+from hdrezka_parser.replay import ReplayMissError, ResponseReplay
+from hdrezka_parser.retry import Backoff, CircuitBreaker
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    def test_replay_misses_do_not_open_the_breaker(self):
+        breaker = CircuitBreaker()
+        with tempfile.TemporaryDirectory() as corpus, mock.patch.object(
+            request, "circuit_breaker", breaker
+        ), mock.patch.object(
+            request, "response_replay", ResponseReplay(corpus, mode="replay")
+        ):
+            for page_id in range(12):
+                with self.assertRaises(ReplayMissError):
+                    request.get_soup(f"https://hdrezka.ag/{page_id}.html")
+
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(len(breaker._results), 0)
+
+    def open_breaker(self, **options) -> CircuitBreaker:
+        breaker = CircuitBreaker(cooldown=0.01, **options)
+        with breaker._condition:
+            breaker._open(breaker.base_cooldown)
+        sleep(0.02)
+        return breaker
+
+    def test_failed_probe_without_answer_lets_the_next_worker_through(self):
+        breaker = self.open_breaker()
+
+        @request.get_valid_page
+        def probe():
+            raise ReplayMissError("no recorded response")
+
+        results = []
+        with mock.patch.object(request, "circuit_breaker", breaker):
+            with self.assertRaises(ReplayMissError):
+                probe()
+            worker = threading.Thread(
+                target=lambda: results.append(request.get_valid_page(lambda: 1)()),
+                daemon=True,
+            )
+            worker.start()
+            worker.join(5)
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(results, [1])
+        self.assertEqual(breaker.state, "closed")
+
+    def test_stuck_probe_is_taken_over(self):
+        breaker = self.open_breaker(probe_timeout=0.05)
+        self.assertTrue(breaker.wait())
+
+        # The first probe never reports, the next worker becomes the probe
+        self.assertTrue(breaker.wait())
+        self.assertEqual(breaker.state, "half-open")
+
+
+class RetryTest(SimpleTestCase):
+    def test_no_backoff_after_the_last_attempt(self):
+        @request.get_valid_page
+        def unreachable():
+            raise requests.exceptions.ConnectionError("refused")
+
+        with mock.patch.object(
+            request, "backoff", Backoff(max_attempts=3)
+        ), mock.patch.object(
+            request, "circuit_breaker", CircuitBreaker()
+        ), mock.patch.object(
+            request, "pause"
+        ) as pause:
+            with self.assertRaises(Exception):
+                unreachable()
+
+        self.assertEqual(pause.call_count, 2)
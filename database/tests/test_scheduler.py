@@ -0,0 +1,79 @@
+import threading
+from datetime import datetime, timedelta
+from time import monotonic
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from bot.scheduler import Scheduler
+
+
+class RecordingWake(threading.Event):
+    """
+    Wake event of the scheduler recording how long the thread would sleep.
+    The wait returns at once and the scheduler stops after ``ticks`` waits.
+    """
+
+    def __init__(self, scheduler: Scheduler, ticks: int = 1):
+        super().__init__()
+        self.scheduler = scheduler
+        self.ticks = ticks
+        self.timeouts = []
+
+    def wait(self, timeout: float = None) -> bool:
+        self.timeouts.append(timeout)
+        if len(self.timeouts) >= self.ticks:
+            self.scheduler._stopping.set()
+        return False
+
+
+class SchedulerTest(SimpleTestCase):
+    def schedule(self, scheduler: Scheduler, due_in: timedelta) -> mock.Mock:
+        job = mock.Mock()
+        scheduled = scheduler.every_day("12:00", job)
+        scheduled.next_run = datetime.now() + due_in
+        return job
+
+    def run_ticks(self, scheduler: Scheduler, ticks: int = 1) -> list[float]:
+        scheduler._wake = RecordingWake(scheduler, ticks)
+        scheduler._run()
+        return scheduler._wake.timeouts
+
+    def test_sleeps_until_the_next_job_is_due(self):
+        scheduler = Scheduler(max_sleep=24 * 3600)
+        job = self.schedule(scheduler, timedelta(hours=2))
+
+        [timeout] = self.run_ticks(scheduler)
+
+        self.assertAlmostEqual(timeout, 2 * 3600, delta=5)
+        job.assert_not_called()
+
+    def test_sleep_is_capped(self):
+        scheduler = Scheduler(max_sleep=600)
+        self.schedule(scheduler, timedelta(hours=2))
+
+        self.assertEqual(self.run_ticks(scheduler, ticks=3), [600, 600, 600])
+
+    def test_due_job_runs_once_then_sleeps_until_its_next_run(self):
+        scheduler = Scheduler(max_sleep=48 * 3600)
+        job = self.schedule(scheduler, timedelta(seconds=-1))
+
+        timeouts = self.run_ticks(scheduler, ticks=2)
+
+        job.assert_called_once_with()
+        [scheduled] = scheduler.jobs.jobs
+        next_run = (scheduled.next_run - datetime.now()).total_seconds()
+        self.assertGreater(next_run, 0)
+        for timeout in timeouts:
+            self.assertAlmostEqual(timeout, next_run, delta=5)
+
+    def test_stop_wakes_the_sleeping_thread(self):
+        scheduler = Scheduler(max_sleep=3600)
+        self.schedule(scheduler, timedelta(hours=2))
+        scheduler.start()
+
+        started = monotonic()
+        scheduler.stop()
+
+        self.assertLess(monotonic() - started, 5)
+        self.assertFalse(scheduler._thread.is_alive())
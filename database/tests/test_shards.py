@@ -0,0 +1,78 @@
+from django.test import TestCase
+
+from db.models import CrawlShard
+from shards import ShardCoordinator
+
+Status = CrawlShard.Status
+
+
+def bounds(shards) -> list[tuple[int, int]]:
+    return list(shards.order_by("first_id").values_list("first_id", "stop_id"))
+
+
+class CreateTest(TestCase):
+    def setUp(self):
+        self.coordinator = ShardCoordinator()
+
+    def test_another_shard_size_fills_only_the_gaps(self):
+        self.coordinator.create(0, 100, shard_size=50)
+
+        count = self.coordinator.create(0, 180, shard_size=30)
+
+        self.assertEqual(count, 5)
+        self.assertEqual(
+            bounds(CrawlShard.objects),
+            [(0, 50), (50, 100), (100, 130), (130, 160), (160, 180)],
+        )
+
+    def test_gap_between_shards_is_cut_at_the_next_shard(self):
+        self.coordinator.create(0, 10, shard_size=10)
+        self.coordinator.create(25, 40, shard_size=10)
+
+        self.coordinator.create(0, 40, shard_size=10)
+
+        self.assertEqual(
+            bounds(CrawlShard.objects),
+            [(0, 10), (10, 20), (20, 25), (25, 35), (35, 40)],
+        )
+
+    def test_existing_shards_take_the_new_rate_and_failed_ones_are_retried(self):
+        self.coordinator.create(0, 20, shard_size=10, rate=1)
+        CrawlShard.objects.filter(first_id=0).update(status=Status.FAILED, attempts=3)
+        CrawlShard.objects.filter(first_id=10).update(status=Status.DONE)
+
+        self.coordinator.create(0, 20, shard_size=10, rate=4)
+
+        self.assertEqual(
+            list(
+                CrawlShard.objects.order_by("first_id").values_list(
+                    "status", "attempts", "rate"
+                )
+            ),
+            [(Status.PENDING, 0, 4), (Status.DONE, 0, 4)],
+        )
+
+
+class RangeTest(TestCase):
+    def setUp(self):
+        self.coordinator = ShardCoordinator()
+        self.coordinator.create(0, 20, shard_size=10)
+        self.coordinator.create(100, 120, shard_size=10)
+
+    def test_unfinished_and_progress_of_a_range(self):
+        CrawlShard.objects.filter(first_id__lt=20).update(status=Status.DONE)
+
+        self.assertEqual(self.coordinator.unfinished(range(0, 20)), 0)
+        self.assertEqual(self.coordinator.unfinished(), 2)
+        self.assertEqual(
+            self.coordinator.progress(range(100, 120))["shards"], {Status.PENDING: 2}
+        )
+
+    def test_claim_keeps_to_the_range(self):
+        ids = range(100, 120)
+
+        claimed = [self.coordinator.claim("worker", ids) for _ in range(3)]
+
+        self.assertEqual(
+            [shard and shard.first_id for shard in claimed], [100, 110, None]
+        )
@@ -0,0 +1,27 @@
+from django.test import TestCase
+
+from db.models import Film
+from trailers import films_without_trailer
+
+
+class FilmsWithoutTrailerTest(TestCase):
+    def setUp(self):
+        ratings = [None, 7.0, 9.0, 7.0, None, 8.0, 7.0]
+        Film.objects.bulk_create(
+            Film(external_id=i, name=f"Film {i}", rating=rating)
+            for i, rating in enumerate(ratings, start=1)
+        )
+
+    def test_best_rated_first_while_trailers_are_saved(self):
+        seen = []
+        for pk, external_id in films_without_trailer(chunk_size=2):
+            seen.append(external_id)
+            Film.objects.filter(pk=pk).update(trailer="")
+
+        self.assertEqual(seen, [3, 6, 7, 4, 2, 5, 1])
+
+    def test_limit_and_min_rating(self):
+        self.assertEqual(len(list(films_without_trailer(limit=3, chunk_size=2))), 3)
+        self.assertEqual(
+            [ext for _, ext in films_without_trailer(min_rating=7.5)], [3, 6]
+        )
@@ -0,0 +1,103 @@
+from typing import Iterator
+
+import colorama
+from django.db.models import F, Q
+
+import init_django_orm  # noqa: F401
+
+from db.models import Film
+from hdrezka_parser.limiter import rate_limiter
+from hdrezka_parser.request import get_trailer_url
+from metrics import logger
+from pipeline import Pipeline, Stage
+from utils import Timer
+
+# Film.trailer is NULL while the trailer was never requested,
+# and an empty string once the site answered that the film has none.
+NO_TRAILER = ""
+
+
+def resolve_trailer(film: Film) -> str | None:
+    """
+    Return the trailer of the film, requesting it from the site on first access
+    and saving it on the film.
+    """
+    if film.trailer is None:
+        film.trailer = get_trailer_url(film.external_id) or NO_TRAILER
+        Film.objects.filter(pk=film.pk).update(trailer=film.trailer)
+    return film.trailer or None
+
+
+def fetch_trailer(film: tuple[int, int]) -> tuple[int, str]:
+    pk, external_id = film
+    return pk, get_trailer_url(external_id) or NO_TRAILER
+
+
+def save_trailer(resolved: tuple[int, str]):
+    pk, trailer = resolved
+    Film.objects.filter(pk=pk).update(trailer=trailer)
+
+
+def films_without_trailer(
+    limit: int = None, min_rating: float = None, chunk_size: int = 500
+) -> Iterator[tuple[int, int]]:
+    """
+    Yield (pk, external_id) of the films without a trailer, best rated first.
+
+    Films are read in chunks by (rating, pk) keyset, so no cursor stays open while
+    the trailers are saved: a long read blocks the writes on SQLite. Films whose
+    trailer is saved meanwhile do not shift the chunks.
+    """
+    films = Film.objects.filter(trailer__isnull=True)
+    if min_rating is not None:
+        films = films.filter(rating__gte=min_rating)
+    films = films.order_by(F("rating").desc(nulls_last=True), "-pk")
+
+    count = 0
+    last = None
+    while limit is None or count < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - count)
+        rows = films
+        if last is not None:
+            rating, pk = last
+            if rating is None:
+                rows = rows.filter(rating__isnull=True, pk__lt=pk)
+            else:
+                rows = rows.filter(
+                    Q(rating__lt=rating)
+                    | Q(rating=rating, pk__lt=pk)
+                    | Q(rating__isnull=True)
+                )
+        chunk = list(rows.values_list("pk", "external_id", "rating")[:size])
+        if not chunk:
+            return
+        for pk, external_id, _ in chunk:
+            yield pk, external_id
+        count += len(chunk)
+        last = chunk[-1][2], chunk[-1][0]
+
+
+@Timer()
+def resolve_trailers(
+    limit: int = None,
+    min_rating: float = None,
+    workers: int = 1,
+    rate: float = 1.0,
+):
+    """
+    Background job resolving trailers of saved films that do not have one yet.
+    Best rated films go first, they are the ones the bot posts.
+    """
+    rate_limiter.configure(rate=rate)
+    pipeline = Pipeline(
+        [
+            Stage("fetch", fetch_trailer, workers, skip_on_stop=True),
+            Stage("write", save_trailer, 1),
+        ]
+    )
+    pipeline.run(films_without_trailer(limit, min_rating))
+
+    logger.info(
+        f"{pipeline.stages[0].processed} trailers resolved",
+        extra={"color": colorama.Fore.GREEN},
+    )
@@ -1,8 +1,12 @@
 import datetime
+import logging
+from functools import wraps
 from typing import Callable
 
 import colorama
-import winsound
+
+from metrics import events_total, logger, task_seconds
+from notify import FAILURE, SUCCESS, AsyncNotifier, notifier
 
 
 class AsDecoratorMixin:
@@ -11,6 +15,7 @@ class AsDecoratorMixin:
     """
 
     def __call__(self, func: Callable) -> Callable:
+        @wraps(func)
         def wrapper(*args, **kwargs):
             with self:
                 return func(*args, **kwargs)
@@ -22,24 +27,29 @@ class ExceptionHandler(AsDecoratorMixin):
     """
     The ExceptionHandler class is a Python class that can be used as a context manager to handle exceptions in a specific way.
     It has two methods, __enter__ and __exit__, which are called when the context is entered and exited, respectively
+
+    On exit a success or failure notification is handed to ``notifier`` (see notify.py),
+    which delivers it in the background, so exiting never waits for it.
     """
 
+    def __init__(self, name: str = None, notifier: AsyncNotifier = notifier):
+        self.name = name
+        self.notifier = notifier
+
+    def __call__(self, func: Callable) -> Callable:
+        self.name = self.name or func.__name__
+        return super().__call__(func)
+
     def __enter__(self):
         pass
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        # If an exception occurred, beep at 2500Hz for 1 second
+        name = self.name or "Task"
         if exc_type is not None:
-            winsound.Beep(2500, 1000)
+            self.notifier.notify(FAILURE, f"{name} failed: {exc_val!r}")
             return
 
-        # Otherwise, play the default beep sound
-        winsound.MessageBeep(winsound.MB_OK)
-        print(
-            colorama.Fore.GREEN
-            + "All tasks are completed successfully🎉"
-            + colorama.Style.RESET_ALL
-        )
+        self.notifier.notify(SUCCESS, f"{name}: all tasks are completed successfully🎉")
 
 
 class Timer(AsDecoratorMixin):
@@ -48,42 +58,55 @@ class Timer(AsDecoratorMixin):
 
     Usage:
     ------
-    with Timer():
+    with Timer("task name"):
         # Code to be timed here
+
+    The duration is recorded in the ``filmbot_task_seconds`` histogram, labelled
+    with the name (the function name when used as a decorator).
     """
 
+    def __init__(self, name: str = None):
+        self.name = name
+
+    def __call__(self, func: Callable) -> Callable:
+        self.name = self.name or func.__name__
+        return super().__call__(func)
+
     def __enter__(self):
         self.start_time = datetime.datetime.now()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
-        Exits the context and calculates the elapsed time. Prints the result
-        to the console in green if the process completed successfully, and
-        in red if an exception was raised.
+        Exits the context and records the elapsed time. Logs the result
+        in green if the process completed successfully, and in red
+        if an exception was raised.
         """
         elapsed = self._elapsed_time()
+        task_seconds.observe(elapsed.total_seconds(), task=self.name or "block")
 
         if exc_type is not None:
-            print(
-                colorama.Fore.RED
-                + f"Process exited with an exception: {exc_val} for {elapsed}"
-            )
+            logger.error(f"Process exited with an exception: {exc_val} for {elapsed}")
             return
 
-        print(
-            colorama.Fore.GREEN
-            + f"Process finished for {elapsed}"
-            + colorama.Style.RESET_ALL
+        logger.info(
+            f"Process finished for {elapsed}", extra={"color": colorama.Fore.GREEN}
         )
 
     def _elapsed_time(self):
         return datetime.datetime.now() - self.start_time
 
 
-def print_info(message: str, method: Callable = len, color: colorama = "CYAN"):
+def print_info(
+    message: str,
+    method: Callable = len,
+    color: colorama = "CYAN",
+    level: int = logging.INFO,
+):
     """
-    Decorator function that prints information about the result of a function call.
+    Decorator function that logs information about the result of a function call.
+    Numeric results of ``method`` (e.g. the number of saved objects) are also added
+    to the ``filmbot_events_total`` counter labelled with the message.
 
     Arguments:
     - message (str): the message that will be printed along with the result of the function call
@@ -92,6 +115,7 @@ def print_info(message: str, method: Callable = len, color: colorama = "CYAN"):
     - method (Callable): a callable object that will be used to process the result of the function call
       (default: len, which returns the length of the object)
     - color (colorama): the color that will be used to print the message (default: CYAN)
+    - level (int): the logging level of the message (default: INFO)
     """
 
     try:
@@ -105,7 +129,12 @@ def print_info(message: str, method: Callable = len, color: colorama = "CYAN"):
     def decorator(func: callable):
         def wrapper(*args, **kwargs):
             result = func(*args, **kwargs)
-            print(color + f"{method(result)} {message}" + colorama.Style.RESET_ALL)
+            info = method(result)
+            events_total.inc(
+                info if isinstance(info, (int, float)) else 1, event=message
+            )
+            if logger.isEnabledFor(level):
+                logger.log(level, f"{info} {message}", extra={"color": color})
             return result
 
         return wrapper